@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+# encoding: utf8
+"""Benchmarks for engfmt
+
+Usage:
+    python benchmark.py [options] [<group>...]
+
+Options:
+    --json <path>        Save the results as JSON.
+    --baseline <path>    Compare against results previously saved with --json.
+    --tolerance <frac>   Slowdown relative to the baseline that is reported as
+                         a regression [default: 0.2].
+
+Some groups compare the current implementation of a hot path against
+a reference implementation and report the time per operation and the speedup,
+the others just report the time per operation. Run without groups to run every
+group. When comparing against a baseline, the exit status is 1 if any
+operation regressed.
+"""
+
+# Imports {{{1
+import argparse
+import json
+import platform
+import sys
+import timeit
+import engfmt
+
+# Utilities {{{1
+BENCHMARKS = {}
+
+def benchmark(name):
+    "Register a benchmark group."
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+def measure(func, repeat=5):
+    "Returns the best time per call in seconds."
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def report(name, rows):
+    """Print the results of a group.
+
+    Rows are either (label, time) or (label, reference time, time), or
+    (label, reference size, size, units) for quantities other than time.
+    """
+    print(name)
+    for row in rows:
+        if len(row) == 2:
+            print('    {:<28s} {:>9.3f}us'.format(row[0], 1e6*row[1]))
+        elif len(row) == 3:
+            label, before, after = row
+            print('    {:<28s} {:>9.3f}us {:>9.3f}us {:>6.2f}x'.format(
+                label, 1e6*before, 1e6*after, before/after
+            ))
+        else:
+            label, before, after, units = row
+            print('    {:<28s} {:>9.3f}{:2s} {:>9.3f}{:2s} {:>6.2f}x'.format(
+                label, before, units, after, units, before/after
+            ))
+
+def compare(results, baseline, tolerance):
+    """Print the change relative to the baseline.
+
+    Times are in seconds and sizes in bytes.
+
+    Returns the number of operations that are slower than the baseline by more
+    than the tolerance.
+    """
+    print('compared to baseline')
+    regressions = 0
+    for group, rows in results.items():
+        for label, time in rows.items():
+            try:
+                before = baseline['results'][group][label]
+            except KeyError:
+                continue
+            ratio = time/before
+            regressed = ratio > 1 + tolerance
+            regressions += regressed
+            print('    {:<40s} {:>11.4g} {:>11.4g} {:>6.2f}x{}'.format(
+                group + ': ' + label, before, time, before/time,
+                '  REGRESSION' if regressed else ''
+            ))
+    return regressions
+
+# Parsing {{{1
+# one example of each form recognized by the number converters
+NUMBER_FORMS = [
+    ('number_with_exponent', '1.4204e9 Hz'),
+    ('number_with_scale_factor', '1.4204 GHz'),
+    ('simple_number', '1 Ohms'),
+    ('currency_with_exponent', '$10e9'),
+    ('currency_with_scale_factor', '$10K'),
+    ('simple_currency', '$10.00'),
+    ('nan_with_units', 'nan Hz'),
+    ('currency_nan', '$inf'),
+    ('simple_nan', '-inf'),
+    ('constant', 'eps0'),
+]
+
+def cascade(value):
+    "Reference implementation: try each number converter in turn."
+    for pattern, get_mant, get_sf, get_units in engfmt.all_number_converters:
+        match = pattern.match(value)
+        if match:
+            return get_mant(match), get_sf(match), get_units(match)
+
+@benchmark('scanner')
+def bench_scanner():
+    "Converter cascade versus single pass recognizer"
+    recognizer = engfmt.all_number_recognizer
+    scan = engfmt._scan
+    return [
+        (
+            form,
+            measure(lambda: cascade(text)),
+            measure(lambda: scan(text, recognizer)),
+        )
+        for form, text in NUMBER_FORMS
+    ]
+
+@benchmark('parse_many')
+def bench_parse_many():
+    "Quantity per value versus parse_many (time per value)"
+    import random
+    random.seed(0)
+    rows = []
+    for size in [1000, 100000]:
+        values = [
+            '{:.4g}{}V'.format(random.uniform(1, 1000), random.choice('munpk'))
+            for i in range(size)
+        ]
+        before = measure(
+            lambda: [engfmt.Quantity(v).to_float() for v in values], repeat=3
+        )
+        after = measure(lambda: engfmt.parse_many(values), repeat=3)
+        rows.append(('{} values'.format(size), before/size, after/size))
+    return rows
+
+@benchmark('parse')
+def bench_parse():
+    "Quantity() for each form"
+    return [
+        (form, measure(lambda: engfmt.Quantity(text)))
+        for form, text in NUMBER_FORMS
+    ]
+
+# Formatting {{{1
+def legacy_to_eng(q, prec=None):
+    "Reference implementation: to_eng as in version 1.2.0."
+    prec = engfmt._prefs().hprec if prec is None else int(prec)
+    if str(q.real).lower() in ['inf', '-inf', 'nan']:
+        return engfmt._combine(q.strip(), '', q.units, ' ')
+    mantissa, exp = ("%.*e" % (prec, q.to_float())).split("e")
+    exp = int(exp)
+    index = exp // 3
+    shift = exp % 3
+    sf = "e%d" % (exp - shift)
+    if index == 0:
+        sf = ''
+    elif index > 0 and index <= len(engfmt.BIG_SCALE_FACTORS):
+        sf = engfmt.BIG_SCALE_FACTORS[index-1]
+    elif index < 0 and -index <= len(engfmt.SMALL_SCALE_FACTORS):
+        sf = engfmt.SMALL_SCALE_FACTORS[-index-1]
+    num = (1, 10, 100)[shift]*float(mantissa)
+    mantissa = "%.*f" % (prec-shift, num)
+    if mantissa.find('.') >= 0:
+        mantissa = mantissa.rstrip("0")
+    mantissa = mantissa.rstrip(".")
+    return engfmt._combine(mantissa, sf, q.units, engfmt._prefs().spacer)
+
+def legacy_to_sci(q, prec=None):
+    "Reference implementation: to_sci as in version 1.2.0."
+    prec = engfmt._prefs().hprec if prec is None else int(prec)
+    if str(q.real).lower() in ['inf', '-inf', 'nan']:
+        return engfmt._combine(q.strip(), '', q.units, ' ')
+    mantissa, exp = ("%.*e" % (prec, q.to_float())).split("e")
+    superscripts = str.maketrans('-0123456789', '⁻⁰¹²³⁴⁵⁶⁷⁸⁹')
+    sf = '×10' + exp.replace('+', '').translate(superscripts)
+    return engfmt._combine(mantissa, sf, q.units, engfmt._prefs().spacer)
+
+@benchmark('to_eng')
+def bench_to_eng():
+    "String round trip versus digit shifting"
+    rows = []
+    for text in ['1.4204 GHz', '47 kOhms', '1.5 us', '250', '$10.5']:
+        q = engfmt.Quantity(text)
+        assert legacy_to_eng(q) == q.to_eng()
+        assert legacy_to_sci(q) == q.to_sci()
+        rows.append(
+            ('to_eng ' + text, measure(lambda: legacy_to_eng(q)),
+            measure(q.to_eng))
+        )
+        rows.append(
+            ('to_sci ' + text, measure(lambda: legacy_to_sci(q)),
+            measure(q.to_sci))
+        )
+    return rows
+
+@benchmark('formatter')
+def bench_formatter():
+    "Quantity per value versus Formatter (time per value)"
+    import random
+    random.seed(0)
+    values = [random.uniform(-1e9, 1e9) for i in range(1000)]
+    fmt = engfmt.Formatter()
+    return [
+        (
+            'eng',
+            measure(lambda: [engfmt.Quantity(v, 'Hz').to_eng() for v in values])
+                / len(values),
+            measure(lambda: [fmt.eng(v, 'Hz') for v in values]) / len(values),
+        ),
+        (
+            'sci',
+            measure(lambda: [engfmt.Quantity(v, 'Hz').to_sci() for v in values])
+                / len(values),
+            measure(lambda: [fmt.sci(v, 'Hz') for v in values]) / len(values),
+        ),
+    ]
+
+@benchmark('format_many')
+def bench_format_many():
+    "Quantity.to_eng per value versus format_many (time per value)"
+    import random
+    random.seed(0)
+    rows = []
+    for size in [1000, 100000]:
+        values = [random.uniform(-1e9, 1e9) for i in range(size)]
+        before = measure(
+            lambda: [engfmt.Quantity(v, 'Hz').to_eng() for v in values],
+            repeat=3
+        )
+        after = measure(lambda: engfmt.format_many(values, 'Hz'), repeat=3)
+        rows.append(('{} values'.format(size), before/size, after/size))
+    return rows
+
+@benchmark('methods')
+def bench_methods():
+    "Quantity rendering methods"
+    q = engfmt.Quantity('1.4204 GHz')
+    return [
+        (name, measure(getattr(q, name)))
+        for name in ['to_eng', 'to_sci', 'to_str', 'to_unitless_eng']
+    ]
+
+@benchmark('format')
+def bench_format():
+    "Quantity.__format__ for each type code"
+    q = engfmt.Quantity('1.4204 GHz')
+    q.add_name('f')
+    q.add_desc('hydrogen line')
+    return [
+        (repr(fmt), measure(lambda: format(q, fmt)))
+        for fmt in [
+            '', 'q', 'r', 's', 'u', 'n', 'd', 'Q', 'R', 'e', 'f', 'g',
+            '>15.2q', '<15.2R'
+        ]
+    ]
+
+# Text processing {{{1
+def synthetic_log(lines, notation):
+    "Returns a log with two numbers per line in the given notation."
+    import random
+    random.seed(0)
+    entries = []
+    for i in range(lines):
+        if notation == 'eng':
+            entries.append('{:04d}: vout = {:.4g}{}V, f = {:.3g} {}Hz'.format(
+                i, random.uniform(1, 1000), random.choice('munpk'),
+                random.uniform(1, 1000), random.choice('kMG')
+            ))
+        else:
+            entries.append('{:04d}: vout = {:.4e}V, f = {:.3e} Hz'.format(
+                i, 10**random.uniform(-12, 3), 10**random.uniform(3, 12)
+            ))
+    return '\n'.join(entries) + '\n'
+
+@benchmark('text')
+def bench_text():
+    "Text processing functions (time per line)"
+    rows = []
+    for lines in [100, 10000]:
+        text = synthetic_log(lines, 'sci')
+        rows.append((
+            'all_to_eng_fmt {} lines'.format(lines),
+            measure(lambda: engfmt.all_to_eng_fmt(text), repeat=3) / lines
+        ))
+        text = synthetic_log(lines, 'eng')
+        rows.append((
+            'all_from_eng_fmt {} lines'.format(lines),
+            measure(lambda: engfmt.all_from_eng_fmt(text), repeat=3) / lines
+        ))
+    return rows
+
+def legacy_convert_text(text, pattern, convert):
+    "Reference implementation: create a Quantity for each number found."
+    out = []
+    start = 0
+    for match in pattern.finditer(text):
+        out.append(text[start:match.start(0)] + convert(match.group(0)))
+        start = match.end(0)
+    return ''.join(out) + text[start:]
+
+@benchmark('substitute')
+def bench_substitute():
+    "Text functions on a dense numeric log (time per line of 8 numbers)"
+    import random
+    random.seed(0)
+    lines = 10000
+    flt = '\n'.join(
+        ' '.join(
+            '{:.4e}{}'.format(
+                10**random.uniform(-12, 12), random.choice(['V', 'A', 'Hz', ''])
+            )
+            for j in range(8)
+        )
+        for i in range(lines)
+    ) + '\n'
+    eng = engfmt.all_to_eng_fmt(flt)
+    return [
+        (
+            'all_to_eng_fmt',
+            measure(lambda: legacy_convert_text(
+                flt, engfmt.embedded_floating_point_notation,
+                engfmt.quant_to_eng
+            ), repeat=3) / lines,
+            measure(lambda: engfmt.all_to_eng_fmt(flt), repeat=3) / lines,
+        ),
+        (
+            'all_from_eng_fmt',
+            measure(lambda: legacy_convert_text(
+                eng, engfmt.embedded_engineering_notation,
+                engfmt.quant_to_str
+            ), repeat=3) / lines,
+            measure(lambda: engfmt.all_from_eng_fmt(eng), repeat=3) / lines,
+        ),
+    ]
+
+@benchmark('memo')
+def bench_memo():
+    "Text functions on a repetitive log without and with the token memo"
+    import random
+    random.seed(0)
+    lines = 10000
+    tokens = ['1.8V', '25C', '1e-9s', '3.3e0V', '1.2e-3A', '2.5e9Hz']
+    flt = '\n'.join(
+        'vdd = {}, id = {}, t = {}, f = {}'.format(
+            *random.sample(tokens, 4)
+        )
+        for i in range(lines)
+    ) + '\n'
+    eng = engfmt.all_to_eng_fmt(flt)
+    pattern = engfmt.embedded_floating_point_notation
+    rows = [(
+        'regex scan only',
+        measure(lambda: pattern.sub(lambda m: m.group(0), flt), repeat=3)/lines
+    )]
+    for name, text in [('all_to_eng_fmt', flt), ('all_from_eng_fmt', eng)]:
+        convert = getattr(engfmt, name)
+        engfmt.set_token_memo(None)
+        before = measure(lambda: convert(text), repeat=3)/lines
+        engfmt.set_token_memo(4096)
+        after = measure(lambda: convert(text), repeat=3)/lines
+        engfmt.set_token_memo(None)
+        rows.append((name, before, after))
+    return rows
+
+def legacy_add_to_namespace(quantities):
+    "Reference implementation: add_to_namespace as in version 1.2.0."
+    import inspect
+    frame = inspect.stack()[1][0]
+    namespace = frame.f_globals
+    for line in quantities.splitlines():
+        match = engfmt.assignment.match(line)
+        if match:
+            name, value, desc = match.groups()
+            if not value:
+                continue
+            quantity = engfmt.Quantity(value)
+            quantity.add_name(name)
+            quantity.add_desc(desc)
+            namespace[name] = quantity
+
+@benchmark('namespace')
+def bench_namespace():
+    "add_to_namespace on small and large decks (time per deck)"
+    rows = []
+    for size in [10, 10000]:
+        deck = '\n'.join(
+            'x{0} = {1}kOhms -- resistor {0}'.format(i, i % 1000 + 1)
+            for i in range(size)
+        )
+        # the definitions are placed in the namespace that calls
+        # add_to_namespace, so call it from within a throw away namespace
+        code = compile('add_to_namespace(deck)', '<deck>', 'exec')
+        legacy = dict(add_to_namespace=legacy_add_to_namespace, deck=deck)
+        current = dict(add_to_namespace=engfmt.add_to_namespace, deck=deck)
+        rows.append((
+            '{} definitions'.format(size),
+            measure(lambda: exec(code, legacy), repeat=3),
+            measure(lambda: exec(code, current), repeat=3),
+        ))
+    return rows
+
+@benchmark('deck_cache')
+def bench_deck_cache():
+    "load_quantities from a file versus from its cache (time per deck)"
+    import os
+    import pathlib
+    import tempfile
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [10, 10000]:
+            deck = pathlib.Path(directory, 'deck{}'.format(size))
+            deck.write_text('\n'.join(
+                'x{0} = {1}kOhms -- resistor {0}'.format(i, i % 1000 + 1)
+                for i in range(size)
+            ))
+            cache = os.path.join(directory, 'cache')
+            engfmt.load_quantities(deck, cache_dir=cache)
+            rows.append((
+                '{} definitions'.format(size),
+                measure(lambda: engfmt.load_quantities(deck), repeat=3),
+                measure(
+                    lambda: engfmt.load_quantities(deck, cache_dir=cache),
+                    repeat=3
+                ),
+            ))
+    return rows
+
+# Serialization {{{1
+@benchmark('serialize')
+def bench_serialize():
+    "Parsing text versus loads_many (time per value)"
+    import random
+    random.seed(0)
+    rows = []
+    for size in [1000, 100000]:
+        text = [
+            '{:.4g}{}{}'.format(
+                random.uniform(1, 1000), random.choice('munpk'),
+                random.choice(['V', 'A', 'Hz', 'Ohms'])
+            )
+            for i in range(size)
+        ]
+        data = engfmt.dumps_many([engfmt.Quantity(t) for t in text])
+        rows.append((
+            '{} values'.format(size),
+            measure(lambda: [engfmt.Quantity(t) for t in text], repeat=3)/size,
+            measure(lambda: engfmt.loads_many(data), repeat=3)/size,
+        ))
+    return rows
+
+class LegacyQuantity(engfmt.Quantity):
+    "Reference implementation: a quantity pickled with its instance dict."
+    __reduce__ = object.__reduce__
+
+@benchmark('pickle')
+def bench_pickle():
+    "Pickling 10000 quantities (time per value, size in bytes per value)"
+    import pickle
+    import random
+    random.seed(0)
+    size = 10000
+    text = [
+        '{:.4g}{}V'.format(random.uniform(1, 1000), random.choice('munpk'))
+        for i in range(size)
+    ]
+    legacy = [LegacyQuantity(t) for t in text]
+    current = [engfmt.Quantity(t) for t in text]
+    batch = engfmt.QuantityList(current)
+    rows = []
+    for label, quantities in [('Quantity', current), ('QuantityList', batch)]:
+        before = pickle.dumps(legacy)
+        after = pickle.dumps(quantities)
+        rows.append((
+            'dumps ' + label,
+            measure(lambda: pickle.dumps(legacy), repeat=3)/size,
+            measure(lambda: pickle.dumps(quantities), repeat=3)/size,
+        ))
+        rows.append((
+            'loads ' + label,
+            measure(lambda: pickle.loads(before), repeat=3)/size,
+            measure(lambda: pickle.loads(after), repeat=3)/size,
+        ))
+        rows.append(('size ' + label, len(before)/size, len(after)/size, 'B'))
+    return rows
+
+# CSV {{{1
+def legacy_convert_csv(src, dest, columns):
+    "Reference implementation: read every row, then convert cell by cell."
+    import csv
+    rows = list(csv.reader(src))
+    names = rows[0]
+    indices = [names.index(c) for c in columns]
+    writer = csv.writer(dest)
+    writer.writerow(names)
+    for row in rows[1:]:
+        for index in indices:
+            try:
+                row[index] = repr(engfmt.quant_to_float(row[index]))
+            except ValueError:
+                pass
+        writer.writerow(row)
+
+@benchmark('csv')
+def bench_csv():
+    "Converting two columns of a CSV file (time per row)"
+    import io
+    import random
+    random.seed(0)
+    rows = []
+    for size in [1000, 100000]:
+        lines = ['name,current,voltage,notes'] + [
+            'R{},{:.4g}{}A,{:.4g} V,ok'.format(
+                i, random.uniform(1, 1000), random.choice('munp'),
+                random.uniform(1, 10)
+            )
+            for i in range(size)
+        ]
+        data = '\n'.join(lines) + '\n'
+        columns = ['current', 'voltage']
+        rows.append((
+            '{} rows'.format(size),
+            measure(lambda: legacy_convert_csv(
+                io.StringIO(data), io.StringIO(), columns
+            ), repeat=3)/size,
+            measure(lambda: engfmt.convert_csv(
+                io.StringIO(data), io.StringIO(), columns
+            ), repeat=3)/size,
+        ))
+    return rows
+
+# Async {{{1
+@benchmark('async')
+def bench_async():
+    "Longest event loop stall while converting a 2MB burst"
+    import asyncio
+    text = synthetic_log(40000, 'flt')
+
+    async def stall(offload_size):
+        async def source():
+            for i in range(0, len(text), 2**18):
+                yield text[i:i + 2**18]
+
+        async def ticker(gaps):
+            last = timeit.default_timer()
+            while True:
+                await asyncio.sleep(0)
+                now = timeit.default_timer()
+                gaps.append(now - last)
+                last = now
+
+        gaps = []
+        task = asyncio.ensure_future(ticker(gaps))
+        await asyncio.sleep(0)
+        async for converted in engfmt.astream_to_eng_fmt(
+            source(), offload_size=offload_size
+        ):
+            pass
+        await asyncio.sleep(0)
+        task.cancel()
+        return max(gaps)
+
+    inline = min(asyncio.run(stall(None)) for i in range(3))
+    offloaded = min(asyncio.run(stall(65536)) for i in range(3))
+    return [('astream_to_eng_fmt', inline, offloaded)]
+
+# Import {{{1
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import engfmt
+imported = time.perf_counter()
+patterns = [
+    value for value in list(vars(engfmt).values())
+    if isinstance(value, engfmt._LazyPattern)
+]
+patterns += [c[0] for c in engfmt.all_number_converters]
+patterns.append(engfmt.DEFAULT_PREFERENCES.assign_rec)
+for pattern in patterns:
+    pattern.compiled()
+compiled = time.perf_counter()
+print(imported - start, compiled - start)
+"""
+
+@benchmark('import')
+def bench_import():
+    "Import with patterns compiled eagerly versus on first use"
+    import os
+    import subprocess
+    import tempfile
+    with tempfile.TemporaryDirectory() as cache:
+        # allow the byte code to be cached so it is not compiled on each import
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=cache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        times = []
+        for i in range(20):
+            output = subprocess.check_output(
+                [sys.executable, '-c', IMPORT_SCRIPT], env=env
+            )
+            times.append([float(t) for t in output.split()])
+    lazy, eager = (min(t) for t in zip(*times[1:]))
+    return [('import engfmt', eager, lazy)]
+
+# Main {{{1
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks for engfmt.',
+        epilog='groups: ' + ', '.join(BENCHMARKS),
+    )
+    parser.add_argument('groups', nargs='*', metavar='group')
+    parser.add_argument('--json', metavar='path', help='save results as JSON')
+    parser.add_argument(
+        '--baseline', metavar='path', help='compare against saved results'
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='slowdown reported as a regression (default: 0.2)'
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.groups or list(BENCHMARKS):
+        func = BENCHMARKS[name]
+        rows = func()
+        report('{}: {}'.format(name, func.__doc__), rows)
+        # record the time taken by the current implementation
+        results[name] = {row[0]: row[min(len(row), 3) - 1] for row in rows}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(
+                engfmt=engfmt.__version__,
+                python=platform.python_version(),
+                machine=platform.machine(),
+                results=results,
+            ), f, indent=4, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,7 +33,20 @@
 
 # Imports {{{1
 __version__ = '1.2.0'
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+import io
+from itertools import islice
+import mmap
+import os
 import re
+import struct
+import sys
+import threading
+from time import perf_counter
 
 # Parameters {{{1
 CURRENCY_SYMBOLS = '$'
@@ -49,6 +62,7 @@ DEFAULT_ASSIGNMENT_RECOGNIZER = (
 )
 
 import math
+from math import isinf, isnan
 CONSTANTS = {
     'h': (6.62606957e-34, 'J-s'),      # Plank's constant
     'k': (1.3806488e-23, 'J/K'),       # Boltzmann's constant
@@ -91,7 +105,43 @@ BIG_SCALE_FACTORS = 'kMGTPEZY'
 SMALL_SCALE_FACTORS = 'munpfazy'
     # These must be given in order, one for every three decades.
 
+SUPERSCRIPTS = {ord(c): s for c, s in zip('-0123456789', '⁻⁰¹²³⁴⁵⁶⁷⁸⁹')}
+    # Translation table used when rendering exponents in scientific notation.
+
 # Pattern Definitions {{{1
+# _LazyPattern {{{2
+class _LazyPattern(object):
+    """A regular expression that is compiled when first used.
+
+    Compiling the regular expressions is most of the cost of importing this
+    module, so it is deferred until they are needed. Attributes of the
+    compiled pattern are available directly from the lazy pattern. If name is
+    given, the module global of that name is replaced by the compiled pattern
+    when it is compiled, so later uses access the compiled pattern directly.
+    """
+    def __init__(self, pattern, name=None):
+        self.pattern = pattern
+        self.name = name
+
+    def compiled(self):
+        "Returns the compiled pattern."
+        try:
+            return self.__dict__['_compiled']
+        except KeyError:
+            compiled = self._compiled = re.compile(self.pattern)
+            if self.name:
+                globals()[self.name] = compiled
+            return compiled
+
+    def __getattr__(self, name):
+        # only called for attributes not already copied to the instance
+        value = getattr(self.compiled(), name)
+        setattr(self, name, value)
+        return value
+
+    def __reduce__(self):
+        return re.compile, (self.pattern,)
+
 # Build regular expressions used to recognize quantities
 def named_regex(name, regex):
     return '(?P<%s>%s)' % (name, regex)
@@ -109,16 +159,32 @@ nan = named_regex('nan', '(?i:inf|nan)')
 left_delimit = r'(?:\A|(?<=[^a-zA-Z0-9_.]))'
 right_delimit = r'(?=[^-+0-9_]|\Z)'
 
-embedded_engineering_notation = re.compile(
+embedded_engineering_notation = _LazyPattern(
     '{left_delimit}{mantissa}{scale_factor}{smpl_units}{right_delimit}'.format(
         **locals()
-    )
+    ),
+    'embedded_engineering_notation'
 )
 
-embedded_floating_point_notation = re.compile(
+embedded_floating_point_notation = _LazyPattern(
     '{left_delimit}{mantissa}{exponent}?{smpl_units}{right_delimit}'.format(
         **locals()
-    )
+    ),
+    'embedded_floating_point_notation'
+)
+
+# Versions of the above used to convert files without decoding them.
+# The patterns contain only ASCII, and bytes outside ASCII behave as delimiters
+# just as non-ASCII characters do, so for ASCII compatible encodings such as
+# UTF-8 the results are the same as for the decoded text.
+embedded_engineering_notation_bytes = _LazyPattern(
+    embedded_engineering_notation.pattern.encode('ascii'),
+    'embedded_engineering_notation_bytes'
+)
+
+embedded_floating_point_notation_bytes = _LazyPattern(
+    embedded_floating_point_notation.pattern.encode('ascii'),
+    'embedded_floating_point_notation_bytes'
 )
 
 number_with_scale_factor = (
@@ -185,42 +251,169 @@ simple_nan = (
     lambda match: ''
 )
 
+# The converters are shared between the two lists so each pattern is only
+# compiled once.
+number_converters = {
+    name: (
+        _LazyPattern(r'\A\s*{}\s*\Z'.format(pattern)),
+        get_mant, get_sf, get_units
+    )
+    for name, (pattern, get_mant, get_sf, get_units) in [
+        ('number_with_exponent', number_with_exponent),
+        ('number_with_scale_factor', number_with_scale_factor),
+        ('simple_number', simple_number),
+        ('currency_with_exponent', currency_with_exponent),
+        ('currency_with_scale_factor', currency_with_scale_factor),
+        ('simple_currency', simple_currency),
+        ('nan_with_units', nan_with_units),
+        ('currency_nan', currency_nan),
+        ('simple_nan', simple_nan),
+    ]
+}
+
 all_number_converters = [
-    (re.compile(r'\A\s*{}\s*\Z'.format(pattern)), get_mant, get_sf, get_units)
-    for pattern, get_mant, get_sf, get_units in [
-        number_with_exponent, number_with_scale_factor, simple_number,
-        currency_with_exponent, currency_with_scale_factor, simple_currency,
-        nan_with_units, currency_nan, simple_nan,
+    number_converters[name] for name in [
+        'number_with_exponent', 'number_with_scale_factor', 'simple_number',
+        'currency_with_exponent', 'currency_with_scale_factor',
+        'simple_currency', 'nan_with_units', 'currency_nan', 'simple_nan',
     ]
 ]
 
 sf_free_number_converters = [
-    (re.compile(r'\A\s*{}\s*\Z'.format(pattern)), get_mant, get_sf, get_units)
-    for pattern, get_mant, get_sf, get_units in [
-        number_with_exponent, simple_number,
-        currency_with_exponent, simple_currency,
-        nan_with_units, currency_nan, simple_nan,
+    number_converters[name] for name in [
+        'number_with_exponent', 'simple_number',
+        'currency_with_exponent', 'simple_currency',
+        'nan_with_units', 'currency_nan', 'simple_nan',
     ]
 ]
 
+# Single pass number recognizer {{{2
+# Recognizes and decomposes every form handled by the number converters above
+# with one match rather than trying each converter in turn. Alternatives that
+# begin with the same text are factored so the mantissa is only scanned once.
+# The alternatives are tried in the same order as in all_number_converters, so
+# the result is that of the first converter that would have matched.
+def _number_recognizer(use_sf, name):
+    mant = r'[0-9]*\.?[0-9]+'
+    exp = '[eE][-+]?[0-9]+'
+    sf = '[%s]' % ''.join(MAPPINGS) if use_sf else '(?!)'
+        # (?!) never matches, this disables the scale factor alternatives
+    units = r'(?:[a-zA-Z][-^/()\w]*)?'
+    nan = '(?i:inf|nan)'
+    return _LazyPattern(''.join([
+        r'\A\s*(?P<sign>[-+]?)(?:',
+            # number_with_exponent, number_with_scale_factor, simple_number
+            r'(?P<mant>{mant})(?:',
+                r'(?P<exp>{exp})\s*(?P<xunits>{units})',
+                r'|\s*(?P<sf>{sf})(?P<sunits>{units})',
+                r'|\s*(?P<units>{units})',
+            ')',
+            # currency_with_exponent, currency_with_scale_factor,
+            # simple_currency, currency_nan
+            '|(?P<currency>[{currency}])(?:',
+                r'(?P<cmant>{mant})(?:(?P<cexp>{exp})|\s*(?P<csf>{sf}))?',
+                '|(?P<cnan>{nan})',
+            ')',
+            # nan_with_units, simple_nan
+            r'|(?P<nan>{nan})(?:\s+(?P<nunits>{units}))?',
+        r')\s*\Z',
+    ]).format(
+        mant=mant, exp=exp, sf=sf, units=units, nan=nan,
+        currency=CURRENCY_SYMBOLS
+    ), name)
+
+all_number_recognizer = _number_recognizer(True, 'all_number_recognizer')
+sf_free_number_recognizer = _number_recognizer(
+    False, 'sf_free_number_recognizer'
+)
+
+def _scan(value, recognizer):
+    """Decompose a string into its components using a single pass recognizer.
+
+    Returns a tuple containing the name of the form that was recognized, the
+    mantissa, the scale factor or exponent, and the units. Returns None if the
+    string is not recognized.
+    """
+    match = recognizer.match(value)
+    if not match:
+        return None
+    (
+        sign, mant, exp, xunits, sf, sunits, units,
+        currency, cmant, cexp, csf, cnan, nan, nunits
+    ) = match.groups()
+    if mant is not None:
+        if exp is not None:
+            return 'number_with_exponent', sign + mant, exp.lower(), xunits
+        if sf is not None:
+            return 'number_with_scale_factor', sign + mant, sf, sunits
+        return 'simple_number', sign + mant, '', units
+    if cmant is not None:
+        if cexp is not None:
+            return 'currency_with_exponent', sign + cmant, cexp.lower(), currency
+        if csf is not None:
+            return 'currency_with_scale_factor', sign + cmant, csf, currency
+        return 'simple_currency', sign + cmant, '', currency
+    if cnan is not None:
+        return 'currency_nan', sign + cnan.lower(), '', currency
+    if nunits is not None:
+        return 'nan_with_units', sign + nan.lower(), '', nunits
+    return 'simple_nan', sign + nan.lower(), '', ''
+
 # Regular expression for recognizing and decomposing string .format method codes
-format_spec = re.compile(r'\A([<>]?)(\d*)(?:\.(\d+))?([qruseEfFgGdnQR]?)\Z')
+format_spec = _LazyPattern(
+    r'\A([<>]?)(\d*)(?:\.(\d+))?([qruseEfFgGdnQR]?)\Z', 'format_spec'
+)
 
 # Utilities {{{1
 # is_str {{{2
-from six import string_types
 def is_str(obj):
-    """Identifies strings in all their various guises."""
-    return isinstance(obj, string_types)
+    """Identifies strings."""
+    return isinstance(obj, str)
 
 def num_to_str(num):
-    return "{0:.{1}g}".format(num, MachinePrecision+1)
+    return "{0:.{1}g}".format(num, _prefs().mprec+1)
+
+# Units table {{{2
+# Quantities share one copy of each of their units strings and scale factors,
+# rather than each holding its own. The table also records whether the units
+# are a currency symbol. It is bounded, units beyond MAX_INTERNED_UNITS are
+# used as given.
+MAX_INTERNED_UNITS = 10000
+UnitsEntry = namedtuple('UnitsEntry', 'units currency')
+_units_table = {}
+
+def _intern_units(units):
+    """Returns the table entry for units, adding it if needed."""
+    entry = _units_table.get(units)
+    if entry is None:
+        entry = UnitsEntry(units, bool(units) and units in CURRENCY_SYMBOLS)
+        if len(_units_table) < MAX_INTERNED_UNITS:
+            entry = _units_table.setdefault(units, entry)
+    return entry
+
+def _is_currency(units):
+    # only quantities constructed from strings add to the table, units that are
+    # only formatted are looked up without being added
+    entry = _units_table.get(units)
+    if entry is None:
+        return bool(units) and units in CURRENCY_SYMBOLS
+    return entry.currency
+
+def units_table():
+    """Returns the units table.
+
+    The table is a dictionary that maps each units string and scale factor
+    that has been used by a quantity constructed from a string to an entry
+    that contains the shared copy of the string and whether it is a currency
+    symbol.
+    """
+    return dict(_units_table)
 
 # _combine {{{2
 def _combine(mantissa, sf, units, spacer):
     mantissa = mantissa.lstrip('+')
     if units:
-        if units in CURRENCY_SYMBOLS:
+        if _is_currency(units):
             # prefix the value with the units
             if mantissa[0] == '-':
                 # if negative, the sign goes before the currency symbol
@@ -237,15 +430,92 @@ def _combine(mantissa, sf, units, spacer):
     else:
         return mantissa + sf
 
+# _eng_mantissa {{{2
+# Rendering the mantissa with prec+1 significant digits and then shifting the
+# decimal point gives the same result as the float based method used
+# historically (scale by 10 or 100 and render again) up to this precision.
+MAX_SHIFTED_PRECISION = 14
+
+def _eng_mantissa(value, prec):
+    """Splits a finite number into a mantissa and an exponent.
+
+    The exponent is a multiple of three. The mantissa is a string that holds
+    prec+1 significant digits with any trailing zeros after the decimal point
+    removed.
+    """
+    number = '%.*e' % (prec, value)
+    e = number.index('e')
+    exp = int(number[e+1:])
+    shift = exp % 3
+    if prec > MAX_SHIFTED_PRECISION:
+        mantissa = '%.*f' % (prec-shift, float(number[:e]) * (1, 10, 100)[shift])
+        if '.' in mantissa:
+            mantissa = mantissa.rstrip('0').rstrip('.')
+        return mantissa, exp - shift
+
+    # move decimal point by slicing the digits
+    if number[0] == '-':
+        sign, digits = '-', number[1:e].replace('.', '')
+    else:
+        sign, digits = '', number[:e].replace('.', '')
+    whole = digits[:shift+1].ljust(shift+1, '0')
+    fraction = digits[shift+1:].rstrip('0')
+    if fraction:
+        return sign + whole + '.' + fraction, exp - shift
+    return sign + whole, exp - shift
+
 # Preferences {{{1
-HumanPrecision = DEFAULT_HUMAN_PRECISION
-MachinePrecision = DEFAULT_MACHINE_PRECISION
-Spacer = DEFAULT_SPACER
-UnityScaleFactor = DEFAULT_UNITY_SCALE_FACTOR
-OutputScaleFactors = DEFAULT_OUTPUT_SCALE_FACTORS
-IgnoreScaleFactors = DEFAULT_IGNORE_SCALE_FACTORS
-AssignmentFormatter = DEFAULT_ASSIGNMENT_FORMATTER
-AssignmentRecognizer = re.compile(DEFAULT_ASSIGNMENT_RECOGNIZER)
+# The preferences are held in an immutable tuple. The global preferences apply
+# everywhere unless they are overridden within a context by preferences(). As
+# contexts are local to threads and asyncio tasks, those overrides do not
+# affect others.
+_Preferences = namedtuple(
+    '_Preferences',
+    'hprec mprec spacer unity output ignore_sf assign_fmt assign_rec'
+)
+
+DEFAULT_PREFERENCES = _Preferences(
+    hprec=DEFAULT_HUMAN_PRECISION,
+    mprec=DEFAULT_MACHINE_PRECISION,
+    spacer=DEFAULT_SPACER,
+    unity=DEFAULT_UNITY_SCALE_FACTOR,
+    output=DEFAULT_OUTPUT_SCALE_FACTORS,
+    ignore_sf=DEFAULT_IGNORE_SCALE_FACTORS,
+    assign_fmt=DEFAULT_ASSIGNMENT_FORMATTER,
+    assign_rec=_LazyPattern(DEFAULT_ASSIGNMENT_RECOGNIZER),
+)
+
+_global_preferences = DEFAULT_PREFERENCES
+_context_preferences = ContextVar('engfmt_preferences', default=None)
+
+def _prefs():
+    "Returns the preferences that are in effect."
+    return _context_preferences.get() or _global_preferences
+
+def _update_preferences(
+        prefs, hprec=False, mprec=False, spacer=False, unity=False,
+        output=False, ignore_sf=0, assign_fmt=False, assign_rec=False
+):
+    "Returns a copy of prefs with the given preferences changed."
+    changes = {}
+    for name, value in [
+        ('hprec', hprec), ('mprec', mprec), ('spacer', spacer),
+        ('unity', unity), ('output', output), ('assign_fmt', assign_fmt),
+    ]:
+        if value is not False:
+            changes[name] = (
+                value if value is not None else getattr(DEFAULT_PREFERENCES, name)
+            )
+    if ignore_sf != 0:
+        changes['ignore_sf'] = (
+            ignore_sf if ignore_sf is not None else DEFAULT_IGNORE_SCALE_FACTORS
+        )
+    if assign_rec is not False:
+        changes['assign_rec'] = (
+            re.compile(assign_rec) if assign_rec is not None
+            else DEFAULT_PREFERENCES.assign_rec
+        )
+    return prefs._replace(**changes)
 
 def set_preferences(
         hprec=False, mprec=False, spacer=False, unity=False, output=False,
@@ -276,39 +546,363 @@ def set_preferences(
 
     Any value not passed in are left alone. Pass in None to reset it to its
     default value.
+
+    If called within the scope of preferences(), only the preferences of that
+    scope are changed.
     """
-    global HumanPrecision, MachinePrecision
-    global Spacer, UnityScaleFactor, OutputScaleFactors, IgnoreScaleFactors
-    global AssignmentFormatter, AssignmentRecognizer
-    if hprec is not False:
-        HumanPrecision = hprec if hprec is not None else DEFAULT_HUMAN_PRECISION
-    if mprec is not False:
-        MachinePrecision = (
-            mprec if mprec is not None else DEFAULT_MACHINE_PRECISION
-        )
-    if spacer is not False:
-        Spacer = spacer if spacer is not None else DEFAULT_SPACER
-    if unity is not False:
-        UnityScaleFactor = (
-            unity if unity is not None else DEFAULT_UNITY_SCALE_FACTOR
-        )
-    if output is not False:
-        OutputScaleFactors = (
-            output if output is not None else DEFAULT_OUTPUT_SCALE_FACTORS
-        )
-    if ignore_sf != 0:
-        IgnoreScaleFactors = (
-            ignore_sf if ignore_sf is not None else DEFAULT_IGNORE_SCALE_FACTORS
-        )
-    if assign_fmt is not False:
-        AssignmentFormatter = (
-            assign_fmt if assign_fmt is not None else DEFAULT_ASSIGNMENT_FORMATTER
+    global _global_preferences
+    kwargs = dict(
+        hprec=hprec, mprec=mprec, spacer=spacer, unity=unity, output=output,
+        ignore_sf=ignore_sf, assign_fmt=assign_fmt, assign_rec=assign_rec
+    )
+    scoped = _context_preferences.get()
+    if scoped:
+        _context_preferences.set(_update_preferences(scoped, **kwargs))
+    else:
+        _global_preferences = _update_preferences(_global_preferences, **kwargs)
+
+@contextmanager
+def preferences(**kwargs):
+    """Scoped Preferences
+
+    Temporarily change preferences. Takes the same arguments as
+    set_preferences(), but the changes only apply within the with statement,
+    and only to the thread or asyncio task that executes it:
+
+        with preferences(hprec=2, spacer=' '):
+            print(quant_to_eng('1.4204GHz'))
+
+    Unlike the global preferences, this is safe to use when quantities are
+    formatted concurrently.
+    """
+    token = _context_preferences.set(_update_preferences(_prefs(), **kwargs))
+    try:
+        yield
+    finally:
+        _context_preferences.reset(token)
+
+# Statistics {{{1
+# Counting and timing of operations is opt-in. When disabled, _stats is None
+# and the cost is a test of that global at each instrumented operation.
+_stats = None
+
+class _Stats(object):
+    """Counters and timers for parse, format and text operations.
+
+    The lock makes it safe to share between threads.
+    """
+    KINDS = ('parse', 'format', 'text')
+
+    def __init__(self, hook):
+        self.hook = hook
+        self.lock = threading.Lock()
+        self.clear()
+
+    def record(self, kind, name, start, matches=0, hits=0, misses=0):
+        """Count an operation that began at start (from perf_counter).
+
+        For text, matches is the number of quantities converted, of which hits
+        were found in the token memo and misses were not.
+        """
+        elapsed = perf_counter() - start
+        with self.lock:
+            counts = self.counts[kind]
+            counts[name] = counts.get(name, 0) + 1
+            self.times[kind] += elapsed
+            self.matches += matches
+            self.memo_hits += hits
+            self.memo_misses += misses
+        if self.hook:
+            self.hook(kind, name, elapsed)
+
+    def clear(self):
+        "Resets the counters and timers."
+        with self.lock:
+            self.counts = {kind: {} for kind in self.KINDS}
+            self.times = {kind: 0.0 for kind in self.KINDS}
+            self.matches = 0
+            self.memo_hits = self.memo_misses = 0
+
+    def snapshot(self):
+        "Returns a copy of the counters and timers."
+        with self.lock:
+            snapshot = {
+                kind: dict(
+                    calls=sum(self.counts[kind].values()),
+                    time=self.times[kind],
+                    counts=dict(self.counts[kind]),
+                ) for kind in self.KINDS
+            }
+            snapshot['text']['matches'] = self.matches
+            snapshot['text']['memo_hits'] = self.memo_hits
+            snapshot['text']['memo_misses'] = self.memo_misses
+        return snapshot
+
+def set_stats(enabled, hook=None):
+    """Enable or disable the gathering of statistics.
+
+    When enabled, the number of times each operation is performed and the time
+    spent on each kind of operation is accumulated. There are three kinds:
+    parse (conversion of strings to quantities), format (rendering of
+    quantities as strings) and text (conversion of the quantities in text).
+    For parse, the count is kept for each form of number recognized (using the
+    names of the number converters), and for 'constant', 'cached' and 'invalid'
+    strings. For format, the count is kept for each Quantity method, and for
+    text, for each conversion function along with the number of quantities
+    converted and how many of those were found in the token memo.
+
+    hook, if given, is called after each operation with the kind, the name and
+    the time taken in seconds. Enabling replaces any existing statistics.
+    Disabled by default.
+    """
+    global _stats
+    _stats = _Stats(hook) if enabled else None
+
+def stats():
+    """Returns the statistics gathered since enabled or last reset.
+
+    The result is a dictionary indexed by kind ('parse', 'format', 'text'),
+    each value is a dictionary containing the number of calls, the total time
+    and the counts indexed by name. The text entry also contains the number of
+    quantities that were converted (matches), and the number that were
+    (memo_hits) and were not (memo_misses) found in the token memo.
+
+    Returns None if statistics are not enabled.
+    """
+    if _stats is not None:
+        return _stats.snapshot()
+
+def reset_stats():
+    "Resets the statistics to zero."
+    if _stats is not None:
+        _stats.clear()
+
+# Parsing {{{1
+# _LRUCache {{{2
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize')
+
+class _LRUCache(object):
+    """Bounded least-recently-used cache.
+
+    Keeps counts of hits, misses and evictions so that its effectiveness can be
+    monitored. The lock makes it safe to share between threads.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        "Returns the cached value, or None if key is not in the cache."
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        "Adds value to the cache, evicting the least recently used if full."
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        "Empties the cache and resets the counters."
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        "Returns the counters as a CacheInfo tuple."
+        return CacheInfo(
+            self.hits, self.misses, self.evictions,
+            self.maxsize, len(self.entries)
         )
-    if assign_rec is not False:
-        AssignmentRecognizer = re.compile(
-            assign_rec if assign_rec is not None else DEFAULT_ASSIGNMENT_RECOGNIZER
+
+# Parse cache {{{2
+_parse_cache = None
+
+def set_parse_cache(maxsize):
+    """Enable or disable the parse cache.
+
+    When enabled, the result of converting a string into a Quantity is
+    remembered so that strings that are seen repeatedly need not be parsed
+    again. Only the most recently used maxsize strings are retained. Pass 0 or
+    None to disable the cache (the default).
+    """
+    global _parse_cache
+    _parse_cache = _LRUCache(maxsize) if maxsize else None
+
+def parse_cache_info():
+    """Returns hits, misses, evictions, maxsize and currsize of parse cache.
+
+    Returns None if the cache is not enabled.
+    """
+    if _parse_cache is not None:
+        return _parse_cache.info()
+
+def clear_parse_cache():
+    "Empties the parse cache."
+    if _parse_cache is not None:
+        _parse_cache.clear()
+
+# _parse {{{2
+def _parse(value, units, ignore_sf):
+    """Converts a string to a number.
+
+    Returns a tuple containing number, mantissa, scale factor and units. The
+    mantissa and scale factor are None if the value is a named constant.
+
+    The cache is keyed on the value of ignore_sf in effect, so changing the
+    ignore_sf preference never returns results parsed under the old setting.
+    Constants are not cached because CONSTANTS may be modified by the user.
+    """
+    stats = _stats
+    if stats is not None:
+        start = perf_counter()
+
+    cache = _parse_cache
+    if cache is not None:
+        key = (value, units, bool(ignore_sf))
+        parsed = cache.get(key)
+        if parsed is not None:
+            if stats is not None:
+                stats.record('parse', 'cached', start)
+            return parsed
+
+    if ignore_sf:
+        components = _scan(value, sf_free_number_recognizer)
+    else:
+        components = _scan(value, all_number_recognizer)
+    if components:
+        form, mantissa, sf, given_units = components
+        sf = sf if sf != '_' else ''
+        if units:
+            assert units == given_units, 'mismatched units'
+        else:
+            units = given_units
+        number = float(mantissa + MAPPINGS.get(sf, [sf])[0])
+        units = _intern_units(units).units
+        sf = _intern_units(sf).units
+    else:
+        try:
+            number, units = CONSTANTS[value]
+        except KeyError:
+            if stats is not None:
+                stats.record('parse', 'invalid', start)
+            raise ValueError('%s: not a valid number.' % value)
+        if stats is not None:
+            stats.record('parse', 'constant', start)
+        return number, None, None, units
+
+    parsed = number, mantissa, sf, units
+    if cache is not None:
+        cache.put(key, parsed)
+    if stats is not None:
+        stats.record('parse', form, start)
+    return parsed
+
+# Formatter class {{{1
+class Formatter(object):
+    """Quantity Formatter
+
+    Renders plain floats with units as strings. The scale factor and exponent
+    tables are built once when the formatter is created rather than on every
+    call, so a formatter is the fastest way to render many numbers:
+
+        >>> fmt = Formatter(prec=2, spacer=' ')
+        >>> fmt.eng(1.4204e9, 'Hz')
+        '1.42 GHz'
+
+    prec, mprec, spacer, unity and output have the same meaning as hprec,
+    mprec, spacer, unity and output in set_preferences(). Any not given are
+    taken from the preferences in effect when the formatter is created.
+    """
+    def __init__(
+        self, prec=None, spacer=None, unity=None, output=None, mprec=None
+    ):
+        prefs = _prefs()
+        self.prec = prefs.hprec if prec is None else int(prec)
+        assert (self.prec >= 0)
+        self.mprec = prefs.mprec if mprec is None else int(mprec)
+        self.spacer = prefs.spacer if spacer is None else spacer
+        self.unity = prefs.unity if unity is None else unity
+        self.output = prefs.output if output is None else output
+
+        # scale factors indexed by exponent, exponents not found are rendered
+        # in exponential notation
+        self._sfs = {}
+        for index, sf in enumerate(BIG_SCALE_FACTORS, 1):
+            if sf in self.output:
+                self._sfs[3*index] = sf
+        for index, sf in enumerate(SMALL_SCALE_FACTORS, 1):
+            if sf in self.output:
+                self._sfs[-3*index] = sf
+        self._unity_sf = '' if self.spacer else self.unity
+
+        # superscripted exponents indexed by the exponent as rendered by %e
+        self._sci_sfs = {}
+        for exp in range(-400, 401):
+            exp = '%+03d' % exp
+            self._sci_sfs[exp] = '×10' + exp.lstrip('+').translate(SUPERSCRIPTS)
+
+        self._str_fmt = '.%dg' % (self.mprec+1)
+
+    def eng(self, value, units=''):
+        "Renders the value and units as a string in engineering notation."
+        if isinf(value) or isnan(value):
+            return _combine(format(value, self._str_fmt), '', units, ' ')
+        mantissa, exp = _eng_mantissa(value, self.prec)
+        if exp:
+            sf = self._sfs.get(exp)
+            if sf is None:
+                sf = 'e%d' % exp
+        elif units and not _is_currency(units):
+            sf = self._unity_sf
+        else:
+            sf = ''
+        return _combine(mantissa, sf, units, self.spacer)
+
+    def sci(self, value, units=''):
+        "Renders the value and units as a string in scientific notation."
+        if isinf(value) or isnan(value):
+            return _combine(format(value, self._str_fmt), '', units, ' ')
+        mantissa, _, exp = ('%.*e' % (self.prec, value)).partition('e')
+        return _combine(mantissa, self._sci_sfs[exp], units, self.spacer)
+
+    def str(self, value, units=''):
+        "Renders the value and units as a string in floating point notation."
+        return _combine(format(value, self._str_fmt), '', units, self.spacer)
+
+    def __repr__(self):
+        return (
+            'Formatter(prec={}, spacer={!r}, unity={!r}, output={!r}, '
+            'mprec={})'.format(
+                self.prec, self.spacer, self.unity, self.output, self.mprec
+            )
         )
 
+# the formatters used by Quantity, indexed by preferences and precision
+_formatters = {}
+
+def _get_formatter(prec):
+    key = (_prefs(), None if prec is None else int(prec))
+    try:
+        return _formatters[key]
+    except KeyError:
+        if len(_formatters) > 64:
+            _formatters.clear()
+        formatter = _formatters[key] = Formatter(prec)
+        return formatter
+
 # Quantity class {{{1
 class Quantity(float):
     def __new__(cls, value, units='', ignore_sf=None):
@@ -320,57 +914,29 @@ class Quantity(float):
                 2.5ns, 1.7 MHz, 1e6ohms, 2.8_V, 1e12 F, 42, etc.
         units: the quantities units.
         """
-        ignore_sf = IgnoreScaleFactors if ignore_sf is None else ignore_sf
+        if ignore_sf is None:
+            ignore_sf = _prefs().ignore_sf
 
         if is_str(value):
-            if ignore_sf:
-                number_converters = sf_free_number_converters
-            else:
-                number_converters = all_number_converters
-            for pattern, get_mant, get_sf, get_units in number_converters:
-                match = pattern.match(value)
-                if match:
-                    mantissa = get_mant(match)
-                    sf = get_sf(match)
-                    sf = sf if sf != '_' else ''
-                    if units:
-                        assert units == get_units(match), 'mismatched units'
-                    else:
-                        units = get_units(match)
-                    number = float(mantissa + MAPPINGS.get(sf, [sf])[0])
-                    break
-            else:
-                try:
-                    number, units = CONSTANTS[value]
-                except KeyError:
-                    raise ValueError('%s: not a valid number.' % value)
+            number, mantissa, sf, units = _parse(value, units, ignore_sf)
         else:
             number = value
+            mantissa = None
 
         self = float.__new__(cls, number)
         self.units = units
-        try:
+        if mantissa is not None:
             # if we got a string, keep the pieces so we can reconstruct it
             # exactly as it was given.
             self._mantissa = mantissa
             self._scale_factor = sf
-        except NameError:
-            pass
         return self
 
     def is_infinite(self):
-        try:
-            value = self._mantissa
-        except AttributeError:
-            value = str(self.real)
-        return value.lower() in ['inf', '-inf', '+inf']
+        return isinf(self)
 
     def is_nan(self):
-        try:
-            value = self._mantissa
-        except AttributeError:
-            value = str(self.real)
-        return value.lower() in ['nan', '-nan', '+nan']
+        return isnan(self)
 
     def add_name(self, name):
         "Add a name."
@@ -416,12 +982,13 @@ class Quantity(float):
 
     def to_unitless_eng(self, prec=None):
         "Renders the value as a string in engineering notation."
-        # this is a bit of a hack, temporarily remove the units
-        units = self.units
-        self.units = None
-        eng_number = self.to_eng(prec)
-        self.units = units
-        return eng_number
+        if _stats is not None:
+            start = perf_counter()
+            try:
+                return self._to_eng(prec, None)
+            finally:
+                _stats.record('format', 'to_unitless_eng', start)
+        return self._to_eng(prec, None)
 
     def to_tuple(self):
         "Returns a tuple that contains the value as a float and the units."
@@ -429,95 +996,76 @@ class Quantity(float):
 
     def to_str(self):
         "Renders the value and units as a string in floating point notation."
+        if _stats is not None:
+            start = perf_counter()
+            try:
+                return self._to_str()
+            finally:
+                _stats.record('format', 'to_str', start)
+        return self._to_str()
+
+    def _to_str(self):
         number = self.to_unitless_str()
         units = self.units
-        return _combine(number, '', units, Spacer)
+        return _combine(number, '', units, _prefs().spacer)
 
     def to_eng(self, prec=None):
         "Renders the value and units as a string in engineering notation."
-
-        # determine precision
-        if prec is None:
-            prec = HumanPrecision
-        else:
-            prec = int(prec)
-        assert (prec >= 0)
-
-        # check for infinities or NaN
-        if self.is_infinite() or self.is_nan():
-            return _combine(self.strip(), '', self.units, ' ')
-
-        # convert into scientific notation with proper precision
-        value = self.to_float()
-        units = self.units
-        number = "%.*e" % (prec, value)
-        mantissa, exp = number.split("e")
-        exp = int(exp)
-
-        # find scale factor
-        index = exp // 3
-        shift = exp % 3
-        sf = "e%d" % (exp - shift)
-        if index == 0:
-            if units and units not in CURRENCY_SYMBOLS and not Spacer:
-                sf = UnityScaleFactor
-            else:
-                sf = ''
-        elif (index > 0):
-            if index <= len(BIG_SCALE_FACTORS):
-                if BIG_SCALE_FACTORS[index-1] in OutputScaleFactors:
-                    sf = BIG_SCALE_FACTORS[index-1]
-        else:
-            index = -index
-            if index <= len(SMALL_SCALE_FACTORS):
-                if SMALL_SCALE_FACTORS[index-1] in OutputScaleFactors:
-                    sf = SMALL_SCALE_FACTORS[index-1]
-
-        # move decimal point as needed
-        if shift == 0:
-            num = float(mantissa)
-        elif (shift == 1):
-            num = 10*float(mantissa)
-        else:
-            num = 100*float(mantissa)
-        mantissa = "%.*f" % (prec-shift, num)
-
-        # remove trailing zeros (except if mantissa does not contain a .)
-        if mantissa.find('.') >= 0:
-            mantissa = mantissa.rstrip("0")
-
-        # remove trailing decimal point
-        mantissa = mantissa.rstrip(".")
-
-        return _combine(mantissa, sf, units, Spacer)
+        if _stats is not None:
+            start = perf_counter()
+            try:
+                return self._to_eng(prec, self.units)
+            finally:
+                _stats.record('format', 'to_eng', start)
+        return self._to_eng(prec, self.units)
+
+    def _to_eng(self, prec, units):
+        value = self.real
+        if isinf(value) or isnan(value):
+            return _combine(self.strip(), '', units, ' ')
+        return _get_formatter(prec).eng(value, units)
 
     def to_sci(self, prec=None):
         "Renders the value and units as a string in scientific notation."
-
-        # determine precision
-        if prec is None:
-            prec = HumanPrecision
-        else:
-            prec = int(prec)
-        assert (prec >= 0)
-
-        # check for infinities or NaN
-        if self.is_infinite() or self.is_nan():
+        if _stats is not None:
+            start = perf_counter()
+            try:
+                return self._to_sci(prec)
+            finally:
+                _stats.record('format', 'to_sci', start)
+        return self._to_sci(prec)
+
+    def _to_sci(self, prec):
+        value = self.real
+        if isinf(value) or isnan(value):
             return _combine(self.strip(), '', self.units, ' ')
-
-        # convert into scientific notation with proper precision
-        value = self.to_float()
-        units = self.units
-        number = "%.*e" % (prec, value)
-        mantissa, exp = number.split("e")
-        exp = exp.replace('+', '')
-        superscripts = str.maketrans('-0123456789', '⁻⁰¹²³⁴⁵⁶⁷⁸⁹')
-        sf = '×10' + exp.translate(superscripts)
-        return _combine(mantissa, sf, units, Spacer)
+        return _get_formatter(prec).sci(value, self.units)
 
     def __float__(self):
         return self.to_float()
 
+    def __reduce__(self):
+        # pickle the value and the attributes as arguments rather than
+        # pickling the instance dictionary
+        attrs = self.__dict__
+        mantissa = attrs.get('_mantissa')
+        if mantissa is None:
+            args = (type(self), self.real, self.units)
+            expected = 1
+        else:
+            args = (
+                type(self), self.real, self.units,
+                mantissa, attrs['_scale_factor']
+            )
+            expected = 3
+        if len(attrs) > expected:
+            # other attributes, such as name and desc
+            return _restore_quantity, args, {
+                name: value for name, value in attrs.items()
+                if name not in _RESTORED_ATTRIBUTES
+            }
+        return _restore_quantity, args
+
     def __str__(self):
         return self.to_eng()
 
@@ -548,44 +1096,84 @@ class Quantity(float):
            Q = name and quantity (f = 1.4204GHz)
            R = name and real (f = 1.4204G)
         """
-        match = format_spec.match(fmt)
-        if match:
-            align, width, prec, ftype = match.groups()
-            if ftype in 'qs':
-                value = self.to_eng(prec)
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype == 'r':
-                value = self.to_unitless_eng(prec)
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype == 'u':
-                value = self.units
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype == 'n':
-                value = getattr(self, 'name', '')
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype == 'd':
-                value = getattr(self, 'desc', '')
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype in 'Q':
-                name = getattr(self, 'name', '')
-                desc = getattr(self, 'desc', '')
-                value = self.to_eng(prec)
-                if name:
-                    value = AssignmentFormatter.format(n=name, v=value, d=desc)
-                return '{0:{1}{2}s}'.format(value, align, width)
-            elif ftype in 'R':
-                name = getattr(self, 'name', '')
-                desc = getattr(self, 'desc', '')
-                value = self.to_unitless_eng(prec)
-                if name:
-                    value = AssignmentFormatter.format(n=name, v=value, d=desc)
-                return '{0:{1}{2}s}'.format(value, align, width)
+        try:
+            render = _format_renderers[fmt]
+        except KeyError:
+            render = _compile_format_spec(fmt)
+        return render(self)
+
+# Pickling {{{2
+_RESTORED_ATTRIBUTES = frozenset(['units', '_mantissa', '_scale_factor'])
+
+def _restore_quantity(cls, value, units, mantissa=None, sf=None):
+    "Recreates a pickled quantity."
+    self = float.__new__(cls, value)
+    self.units = units if units is None else _intern_units(units).units
+    if mantissa is not None:
+        self._mantissa = mantissa
+        self._scale_factor = sf
+    return self
+
+# Format specs {{{2
+# The function that renders a quantity for each format spec seen, so the spec
+# is only parsed once.
+_format_renderers = {}
+
+def _compile_format_spec(fmt):
+    """Returns a function that renders a quantity as given by the format spec.
+
+    The function is cached for later use.
+    """
+    match = format_spec.match(fmt)
+    if not match:
+        render = Quantity.to_eng
+    else:
+        align, width, prec, ftype = match.groups()
+        prec = None if prec is None else int(prec)
+        if ftype in 'qs':
+            def render(q):
+                return q.to_eng(prec)
+        elif ftype == 'r':
+            def render(q):
+                return q.to_unitless_eng(prec)
+        elif ftype == 'u':
+            def render(q):
+                return q.units
+        elif ftype == 'n':
+            def render(q):
+                return getattr(q, 'name', '')
+        elif ftype == 'd':
+            def render(q):
+                return getattr(q, 'desc', '')
+        elif ftype in 'QR':
+            if ftype == 'Q':
+                to_eng = Quantity.to_eng
             else:
-                value = self.to_float()
-                return '{0:{1}}'.format(value, fmt)
+                to_eng = Quantity.to_unitless_eng
+            def render(q):
+                value = to_eng(q, prec)
+                name = getattr(q, 'name', '')
+                if name:
+                    desc = getattr(q, 'desc', '')
+                    value = _prefs().assign_fmt.format(n=name, v=value, d=desc)
+                return value
         else:
-            return self.to_eng()
-
+            def render(q):
+                return format(q.to_float(), fmt)
+            width = None
+
+        if width:
+            # pad to the width, strings are left aligned by default
+            unpadded = render
+            pad = str.rjust if align == '>' else str.ljust
+            width = int(width)
+            def render(q):
+                return pad(unpadded(q), width)
+
+    if len(_format_renderers) > 1024:
+        _format_renderers.clear()
+    _format_renderers[fmt] = render
+    return render
 
 # Shortcut functions {{{1
 def quant_to_tuple(value, units=None):
@@ -612,27 +1200,510 @@ def quant_to_unitless_str(value, units=None):
 def quant_strip(value):
     return Quantity(value).strip()
 
+# Array functions {{{1
+# These require NumPy, which is imported when they are first used.
+# parse_many {{{2
+def parse_many(values, units=None, ignore_sf=None):
+    """Convert many quantities to floats at once.
+
+    values: a sequence or NumPy array of strings or numbers.
+    units: the units. If given, strings with other units are reported as
+        invalid.
+    ignore_sf: whether scale factors should be ignored, uses the global
+        preference if not given.
+
+    Returns a tuple containing the values as a float64 array, the units, and a
+    boolean array that is True for each entry that could not be converted
+    (those entries are nan in the value array). The units are returned as
+    a single string if all valid entries share the same units, otherwise they
+    are returned as an array of strings.
+
+    No Quantity objects are created. Each string is decomposed by the single
+    pass recognizer, then the mantissas and scale factors are combined and
+    converted to floats in bulk.
+    """
+    import numpy as np
+    ignore_sf = _prefs().ignore_sf if ignore_sf is None else ignore_sf
+    recognizer = sf_free_number_recognizer if ignore_sf else all_number_recognizer
+
+    # decompose each value into mantissa, scale factor and units
+    scanned = [
+        _scan(value, recognizer) if is_str(value) else value
+        for value in values
+    ]
+    invalid = np.zeros(len(scanned), dtype=bool)
+    for i, components in enumerate(scanned):
+        if type(components) is tuple:
+            continue
+        if components is None:
+            value = values[i]
+            if value in CONSTANTS:
+                number, found_units = CONSTANTS[value]
+                scanned[i] = (None, repr(number), '', found_units)
+            else:
+                scanned[i] = (None, 'nan', '', '')
+                invalid[i] = True
+        else:
+            scanned[i] = (None, repr(float(components)), '', units or '')
+    forms, mantissas, scale_factors, found_units = (
+        zip(*scanned) if scanned else ((), (), (), ())
+    )
+    found_units = np.array(found_units, dtype=str)
+    if units:
+        invalid |= found_units != units
+
+    # convert the scale factors to exponents using a lookup table
+    scale_factors, indices = np.unique(
+        np.array(scale_factors, dtype=str), return_inverse=True
+    )
+    exponents = np.array(
+        [MAPPINGS.get(sf, [sf])[0] for sf in scale_factors.tolist()], dtype=str
+    )
+    numbers = np.char.add(
+        np.array(mantissas, dtype=str), exponents[indices.reshape(-1)]
+    ).astype(np.float64)
+    numbers[invalid] = np.nan
+
+    # return a single unit if they are all the same
+    distinct_units = np.unique(found_units[~invalid]).tolist()
+    if len(distinct_units) <= 1:
+        found_units = distinct_units[0] if distinct_units else (units or '')
+    else:
+        found_units[invalid] = ''
+    return numbers, found_units, invalid
+
+
+# format_many {{{2
+def format_many(values, units='', prec=None):
+    """Convert many numbers to engineering format at once.
+
+    values: a sequence or NumPy array of numbers.
+    units: the units, shared by all of the values.
+    prec: the precision, uses the human precision preference if not given.
+
+    Returns an array of strings the same shape as values, each the same as
+    would be produced by Quantity(value, units).to_eng(prec).
+
+    The exponents, scale factors and rounded mantissas are computed on the
+    whole array at once. Values whose rounding cannot be decided exactly in
+    floating point, such as those that fall very close to a tie, are rendered
+    one at a time instead.
+    """
+    import numpy as np
+    formatter = _get_formatter(prec)
+    prec = formatter.prec
+    units = units or ''
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.ravel()
+    if not flat.size:
+        return np.array([], dtype=str).reshape(values.shape)
+
+    # find the exponent and the prec+1 significant digits of each value
+    magnitudes = np.abs(flat)
+    zero = magnitudes == 0
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        exps = np.floor(np.log10(np.where(zero, 1, magnitudes)))
+        exps = np.where(np.isfinite(exps), exps, 0).astype(np.int64)
+        scaled = magnitudes * np.power(10.0, prec - exps)
+        digits = np.rint(scaled)
+        fraction = scaled - np.floor(scaled)
+    lower, upper = 10.0**prec, 10.0**(prec+1)
+    exact = zero | (
+        np.isfinite(flat)
+        & (np.abs(exps) < 290)
+        & (scaled >= lower) & (scaled < upper)
+        & (np.abs(fraction - 0.5) > scaled * 2.0**-48)
+    )
+    if prec > MAX_SHIFTED_PRECISION:
+        exact[:] = False
+    digits = np.where(exact, digits, 0).astype(np.int64)
+    exps = np.where(exact, exps, 0)
+
+    # rounding up to the next power of ten moves to the next exponent
+    carried = digits == 10**(prec+1)
+    digits[carried] //= 10
+    exps[carried] += 1
+
+    # split the digits into a whole part and a fraction without trailing zeros
+    shifts = exps % 3
+    places = prec - shifts
+    divisors = 10**np.maximum(places, 0)
+    wholes = digits // divisors * 10**np.maximum(-places, 0)
+    fractions = digits % divisors
+    for i in range(prec):
+        trailing = (fractions % 10 == 0) & (places > 0)
+        if not trailing.any():
+            break
+        fractions[trailing] //= 10
+        places[trailing] -= 1
+    mantissas = wholes.astype(str).astype(object)
+    has_fraction = fractions != 0
+    if has_fraction.any():
+        padded = np.char.zfill(
+            fractions[has_fraction].astype(str), places[has_fraction]
+        )
+        mantissas[has_fraction] += '.' + padded.astype(object)
+    negative = np.signbit(flat)
+
+    # look up the text that goes before and after each distinct exponent
+    currency = bool(units) and _is_currency(units)
+    unique, inverse = np.unique(exps - shifts, return_inverse=True)
+    suffixes = []
+    for exp in unique.tolist():
+        if exp:
+            sf = formatter._sfs.get(exp)
+            if sf is None:
+                sf = 'e%d' % exp
+        elif units and not currency:
+            sf = formatter._unity_sf
+        else:
+            sf = ''
+        # the mantissa follows the currency symbol, otherwise it leads
+        text = _combine('0', sf, units, formatter.spacer)
+        suffixes.append(text[len(units)+1:] if currency else text[1:])
+    suffixes = np.array(suffixes, dtype=object)[inverse.ravel()]
+    if currency:
+        prefixes = np.where(negative, '-' + units, units).astype(object)
+    else:
+        prefixes = np.where(negative, '-', '').astype(object)
+    results = prefixes + mantissas + suffixes
+
+    # render the values that could not be done in bulk one at a time
+    eng = formatter.eng
+    for i in np.flatnonzero(~exact).tolist():
+        results[i] = eng(flat[i].item(), units)
+    return np.array(results.tolist(), dtype=str).reshape(values.shape)
+
+
+# QuantityArray class {{{1
+class QuantityArray(object):
+    def __init__(self, values=(), units=''):
+        """Physical Quantity Array
+        A sequence of real values that share the same units.
+
+        The values are held in a contiguous buffer of doubles rather than as
+        individual Quantity objects.
+
+        values: an array('d'), a 1-D NumPy array of float64, or any iterable of
+            numbers. Arrays are used in place rather than being copied.
+        units: the units shared by all of the values.
+        """
+        try:
+            view = memoryview(values)
+            if view.format != 'd' or view.ndim != 1:
+                raise TypeError
+        except TypeError:
+            view = memoryview(array('d', values))
+        self._values = view
+        self.units = units
+
+    @classmethod
+    def from_strings(cls, values, units=None, ignore_sf=None):
+        """Create a QuantityArray from a sequence of strings.
+
+        All of the strings must have the same units, which must be units if
+        given. Raises ValueError if they do not.
+        """
+        ignore_sf = _prefs().ignore_sf if ignore_sf is None else ignore_sf
+        numbers = array('d')
+        for value in values:
+            number, mantissa, sf, found = _parse(value, None, ignore_sf)
+            if units is None:
+                units = found
+            elif found != units:
+                raise ValueError('{}: expected units of {!r}.'.format(
+                    value, units
+                ))
+            numbers.append(number)
+        return cls(numbers, units or '')
+
+    @property
+    def values(self):
+        "The values as a memoryview of doubles."
+        return self._values
+
+    def tolist(self):
+        "Returns the values as a list of floats."
+        return self._values.tolist()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.__class__(self._values[index], self.units)
+        return Quantity(self._values[index], self.units)
+
+    def __iter__(self):
+        units = self.units
+        for value in self._values:
+            yield Quantity(value, units)
+
+    def to_eng(self, prec=None):
+        "Renders the values and units as strings in engineering notation."
+        try:
+            return format_many(self._values, self.units, prec).tolist()
+        except ImportError:  # pragma: no cover
+            # NumPy is not available
+            return [quantity.to_eng(prec) for quantity in self]
+
+    def to_str(self):
+        "Renders the values and units as strings in floating point notation."
+        units = self.units
+        spacer = _prefs().spacer
+        return [
+            _combine(num_to_str(value), '', units, spacer)
+            for value in self._values
+        ]
+
+    def __str__(self):
+        return '[{}]'.format(', '.join(self.to_eng()))
+
+    def __repr__(self):
+        return 'QuantityArray({!r}, {!r})'.format(self.tolist(), self.units)
+
+    def __reduce__(self):
+        # the values are pickled as one block
+        return loads_many, (dumps_many(self),)
+
+
+# QuantityList class {{{1
+class QuantityList(list):
+    """Quantity List
+
+    A list of quantities that is pickled compactly. When pickled, the
+    quantities are serialized together using dumps_many(), so their values are
+    held in one buffer and each distinct units string is held once. This makes
+    it much faster to send many quantities to another process, for example
+    through a multiprocessing queue or a ProcessPoolExecutor.
+
+    If any member is not a Quantity or has other attributes (such as a name or
+    description), the members are pickled individually.
+    """
+    def __reduce__(self):
+        for quantity in self:
+            if type(quantity) is not Quantity:
+                break
+            attrs = quantity.__dict__
+            if len(attrs) != (1 if attrs.get('_mantissa') is None else 3):
+                break
+        else:
+            return _load_quantity_list, (dumps_many(self),)
+        return QuantityList, (list(self),)
+
+def _load_quantity_list(data):
+    return QuantityList(loads_many(data))
+
+
 # Text processing functions {{{1
+# _convert_text {{{2
+def _convert_text(text, pattern, build, name):
+    """Replace each match of pattern in text.
+
+    build is the function that builds the replacement function, name
+    identifies the conversion in the statistics.
+    """
+    replace, memo, table = _get_replacer(build)
+    stats = _stats
+    if memo is None and stats is None:
+        return pattern.sub(replace, text)
+    hits = misses = 0
+    if memo is not None:
+        replace, counts = memo.memoize(replace, table)
+    if stats is not None:
+        began = perf_counter()
+    text, matches = pattern.subn(replace, text)
+    if memo is not None:
+        misses = counts[0]
+        hits = matches - misses
+        memo.count(hits, misses)
+    if stats is not None:
+        stats.record('text', name, began, matches, hits, misses)
+    return text
+
+def _convert_token(convert, token):
+    """Convert a token by way of a Quantity."""
+    try:
+        return convert(token)
+    except ValueError:
+        # not a valid quantity, such as 1_V when ignoring scale factors,
+        # this is not essential, so leave it unchanged
+        return token
+
+# Replacement functions {{{2
+# The text functions do not create a Quantity for each number they find.
+# Instead the number is converted directly from the pieces captured by the
+# embedded pattern, giving the same result as the Quantity would. Tokens that
+# the Quantity would interpret differently, those with an underscore in the
+# units, are converted by way of a Quantity. Tokens whose value overflows to
+# infinity are left unchanged.
+# The functions are built for, and capture, the preferences in effect.
+def _token_to_eng(token):
+    """Converts a number found in text to engineering format.
+
+    A number too large to be represented is left unchanged.
+    """
+    quantity = Quantity(token)
+    if isinf(quantity):
+        # the token consists of digits, so it overflowed
+        return token
+    return quantity.to_eng()
+
+def _eng_replacer(prefs):
+    # for embedded_floating_point_notation, groups are mant, exp, units
+    eng = _get_formatter(None).eng
+    use_sf = not prefs.ignore_sf
+    def replace(match):
+        mant, exp, units = match.groups()
+        if '_' in units:
+            return _convert_token(_token_to_eng, match.group(0))
+        if exp is not None:
+            value = float(mant + exp)
+        elif use_sf and units and units[0] in MAPPINGS:
+            # a leading scale factor
+            value = float(mant + MAPPINGS[units[0]][0])
+            units = units[1:]
+        else:
+            value = float(mant)
+        if isinf(value):
+            return match.group(0)
+        return eng(value, units)
+    return replace
+
+def _str_replacer(prefs):
+    # for embedded_engineering_notation, groups are mant, sf, units
+    spacer = prefs.spacer
+    use_sf = not prefs.ignore_sf
+    def replace(match):
+        mant, sf, units = match.groups()
+        if sf == '_' or '_' in units:
+            return _convert_token(quant_to_str, match.group(0))
+        if use_sf:
+            return _combine(mant + MAPPINGS[sf][0], '', units, spacer)
+        return _combine(mant, '', sf + units, spacer)
+    return replace
+
+# the replacement functions, with the token memo and table they use, indexed
+# by the function that builds them and the preferences
+_replacers = {}
+
+def _get_replacer(build):
+    """Returns the replacement function, the token memo and its table.
+
+    The memo and table are None if the token memo is not enabled.
+    """
+    prefs = _prefs()
+    key = (build, prefs)
+    try:
+        return _replacers[key]
+    except KeyError:
+        if len(_replacers) > 64:
+            _replacers.clear()
+        memo = _token_memo
+        table = None if memo is None else {}
+        replacer = _replacers[key] = build(prefs), memo, table
+        return replacer
+
+# Token memo {{{2
+# Logs tend to repeat the same quantities many times. The memo maps each token
+# matched by the text functions to its replacement, so repeated tokens cost
+# a dictionary lookup. Each replacement function has its own table, so the
+# entries are specific to the preferences in effect. A table that grows beyond
+# maxsize is emptied.
+_token_memo = None
+
+class _TokenMemo(object):
+    """Bounded memo of converted tokens.
+
+    Each conversion counts its own misses, so conversions running at the same
+    time in other threads do not disturb the count. Counting hits would slow
+    the lookup, so they are derived from the number of matches once the text
+    is converted.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def memoize(self, convert, table):
+        """Returns a version of the replacement function that uses table.
+
+        Also returns a list that holds the number of misses it has had.
+        """
+        counts = [0]
+        maxsize = self.maxsize
+        def replace(match):
+            token = match.group(0)
+            try:
+                return table[token]
+            except KeyError:
+                pass
+            converted = table[token] = convert(match)
+            counts[0] += 1
+            if len(table) > maxsize:
+                self.evict(table)
+            return converted
+        return replace, counts
+
+    def evict(self, table):
+        "Empty table if it is full."
+        with self.lock:
+            if len(table) > self.maxsize:
+                self.evictions += len(table)
+                table.clear()
+
+    def count(self, hits, misses):
+        "Count the hits and misses of one conversion."
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+    def info(self):
+        "Returns the counters as a CacheInfo tuple."
+        currsize = sum(
+            len(table) for replace, memo, table in list(_replacers.values())
+            if memo is self
+        )
+        with self.lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, self.maxsize, currsize
+            )
+
+def set_token_memo(maxsize):
+    """Enable or disable the token memo.
+
+    When enabled, all_to_eng_fmt, all_from_eng_fmt and the streaming versions
+    remember the replacement for each quantity they find, so quantities that
+    are seen repeatedly need not be converted again. Replacements are
+    remembered separately for each set of preferences, up to maxsize for each.
+    Pass 0 or None to disable the memo (the default).
+    """
+    global _token_memo
+    _token_memo = _TokenMemo(maxsize) if maxsize else None
+    _replacers.clear()
+
+def token_memo_info():
+    """Returns hits, misses, evictions, maxsize and currsize of token memo.
+
+    Returns None if the memo is not enabled.
+    """
+    if _token_memo is not None:
+        return _token_memo.info()
+
+def clear_token_memo():
+    "Empties the token memo."
+    if _token_memo is not None:
+        set_token_memo(_token_memo.maxsize)
+
 # All to engineering format {{{2
 def all_to_eng_fmt(text):
     """Convert all quantities found in text to engineering format.
 
     It is assumed that any units are assumed to be simple, meaning that they
     contain only alphabetic characters (no numbers or symbols)."""
-    out = []
-    start = 0
-    for match in embedded_floating_point_notation.finditer(text):
-        end = match.start(0)
-        number = match.group(0)
-        try:
-            number = quant_to_eng(number)
-        except ValueError:  # pragma: no cover
-            # something unexpected happened
-            # but this is not essential, so ignore it
-            pass
-        out.append(text[start:end] + number)
-        start = match.end(0)
-    return ''.join(out) + text[start:]
+    return _convert_text(
+        text, embedded_floating_point_notation, _eng_replacer, 'quant_to_eng'
+    )
 
 # All from engineering format {{{2
 def all_from_eng_fmt(text):
@@ -641,42 +1712,818 @@ def all_from_eng_fmt(text):
     It is assumed that there is no space between the number and the scale factor
     and any units are assumed to be simple, meaning that they contain only
     alphabetic characters (no numbers or symbols)."""
-    out = []
+    return _convert_text(
+        text, embedded_engineering_notation, _str_replacer, 'quant_to_str'
+    )
+
+# Streaming {{{2
+# Characters that may be part of an embedded quantity or that affect whether
+# one is recognized. Text can be split just after any other character without
+# changing the result of the conversion: such a character can neither be part
+# of a quantity nor prevent one from being recognized on either side of it.
+TOKEN_CHARS = (
+    '0123456789.+-_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+
+class _StreamConverter(object):
+    """Converts text that arrives in pieces.
+
+    Text that follows the last safe split point of a chunk is held back until
+    more text arrives, so quantities split across chunks are converted
+    correctly. The held back text only grows if chunks contain no safe split
+    points at all.
+    """
+    def __init__(self, convert_text):
+        self.convert_text = convert_text
+        self.pending = ''
+
+    def take(self, chunk):
+        "Returns the text that can be released, unconverted."
+        split = len(chunk.rstrip(TOKEN_CHARS))
+        if not split:
+            self.pending += chunk
+            return ''
+        text = self.pending + chunk[:split]
+        self.pending = chunk[split:]
+        return text
+
+    def take_rest(self):
+        "Returns the remaining text, unconverted."
+        text, self.pending = self.pending, ''
+        return text
+
+    def feed(self, chunk):
+        "Returns the converted text that can be released."
+        text = self.take(chunk)
+        return self.convert_text(text) if text else ''
+
+    def flush(self):
+        "Returns the remaining converted text."
+        return self.convert_text(self.take_rest())
+
+def _stream(source, convert_text, chunk_size):
+    if hasattr(source, 'read'):
+        source = iter(partial(source.read, chunk_size), '')
+    converter = _StreamConverter(convert_text)
+    for chunk in source:
+        converted = converter.feed(chunk)
+        if converted:
+            yield converted
+    converted = converter.flush()
+    if converted:
+        yield converted
+
+def stream_to_eng_fmt(source, chunk_size=65536):
+    """Convert quantities found in a stream of text to engineering format.
+
+    source: a readable text file or an iterable of strings.
+    chunk_size: the number of characters read at once from a file.
+
+    A generator that yields the converted text in pieces, so that arbitrarily
+    large files can be converted using bounded memory. The result is the same
+    as all_to_eng_fmt applied to the whole text.
+    """
+    return _stream(source, all_to_eng_fmt, chunk_size)
+
+def stream_from_eng_fmt(source, chunk_size=65536):
+    """Convert quantities found in a stream of text from engineering format.
+
+    source: a readable text file or an iterable of strings.
+    chunk_size: the number of characters read at once from a file.
+
+    A generator that yields the converted text in pieces, so that arbitrarily
+    large files can be converted using bounded memory. The result is the same
+    as all_from_eng_fmt applied to the whole text.
+    """
+    return _stream(source, all_from_eng_fmt, chunk_size)
+
+# Asynchronous streaming {{{2
+async def _astream(
+    source, convert_text, chunk_size, executor, offload_size, encoding
+):
+    import asyncio
+    import codecs
+    import contextvars
+
+    async def chunks():
+        if hasattr(source, 'read'):
+            while True:
+                chunk = await source.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            async for chunk in source:
+                yield chunk
+
+    async def convert(text):
+        if offload_size is not None and len(text) >= offload_size:
+            # run in the context of the caller so its preferences are used
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, context.run, convert_text, text
+            )
+        return convert_text(text)
+
+    converter = _StreamConverter(convert_text)
+    decoder = None
+    async for chunk in chunks():
+        if not is_str(chunk):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        text = converter.take(chunk)
+        if text:
+            yield await convert(text)
+    text = converter.take_rest()
+    if decoder is not None:
+        text += decoder.decode(b'', final=True)
+    if text:
+        yield await convert(text)
+
+def astream_to_eng_fmt(
+    source, chunk_size=65536, executor=None, offload_size=None,
+    encoding='utf-8'
+):
+    """Convert quantities found in an asynchronous stream to engineering format.
+
+    source: an asyncio.StreamReader, or any object with a coroutine read
+        method, or an async iterable of strings or bytes.
+    chunk_size: the maximum number of characters or bytes read at once.
+    executor: the executor used to convert large pieces of text, None uses the
+        default executor of the event loop. It must run in this process, such
+        as a ThreadPoolExecutor.
+    offload_size: if given, pieces of text of at least this many characters
+        are converted in the executor rather than in the event loop.
+    encoding: used to decode bytes, characters split across reads are handled
+        correctly.
+
+    An async generator that yields the converted text in pieces. The next piece
+    is read only when the previous one has been consumed, so a slow consumer
+    slows the reading of the source. The result is the same as all_to_eng_fmt
+    applied to the whole text.
+    """
+    return _astream(
+        source, all_to_eng_fmt, chunk_size, executor, offload_size, encoding
+    )
+
+def astream_from_eng_fmt(
+    source, chunk_size=65536, executor=None, offload_size=None,
+    encoding='utf-8'
+):
+    """Convert quantities found in an asynchronous stream from engineering format.
+
+    The arguments are the same as for astream_to_eng_fmt. The result is the
+    same as all_from_eng_fmt applied to the whole text.
+    """
+    return _astream(
+        source, all_from_eng_fmt, chunk_size, executor, offload_size, encoding
+    )
+
+# Files {{{2
+def _convert_buffer(
+    buffer, pattern, convert, write, pos=0, endpos=None, name=None
+):
+    """Convert quantities found in a bytes-like buffer.
+
+    The text between the quantities is passed to write as memoryview slices of
+    the buffer, only the quantities themselves are copied and converted. name
+    identifies the conversion in the statistics, by default it is the name of
+    convert.
+    """
+    if _stats is not None:
+        began = perf_counter()
+    endpos = len(buffer) if endpos is None else endpos
+    view = memoryview(buffer)
+    matches = 0
+    try:
+        start = pos
+        for match in pattern.finditer(buffer, pos, endpos):
+            matches += 1
+            try:
+                number = convert(match.group(0).decode('ascii'))
+            except ValueError:  # pragma: no cover
+                # something unexpected happened
+                # but this is not essential, so ignore it
+                continue
+            write(view[start:match.start(0)])
+            write(number.encode('utf8'))
+            start = match.end(0)
+        write(view[start:endpos])
+    finally:
+        view.release()
+    if _stats is not None:
+        _stats.record('text', name or convert.__name__, began, matches)
+
+def _convert_file(
+    src, dest, pattern, convert, name, workers, chunk_size, path=None
+):
+    # path is the path of src if it was given as one, the worker processes
+    # reopen the file using it
+    if not hasattr(src, 'fileno'):
+        with open(src, 'rb') as f:
+            return _convert_file(
+                f, dest, pattern, convert, name, workers, chunk_size, src
+            )
+    if not hasattr(dest, 'write'):
+        # opening dest truncates it, so it must not be the input
+        if os.path.exists(dest) and os.path.samestat(
+            os.fstat(src.fileno()), os.stat(dest)
+        ):
+            raise ValueError(
+                '{}: input and output are the same file.'.format(dest)
+            )
+        with open(dest, 'wb') as dest:
+            return _convert_file(
+                src, dest, pattern, convert, name, workers, chunk_size, path
+            )
+    if not os.fstat(src.fileno()).st_size:
+        return
+    mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if workers == 1 or path is None:
+            # a file object may not have a path that the workers can open
+            _convert_buffer(mapped, pattern, convert, dest.write, name=name)
+        else:
+            ranges = _split_buffer(mapped, chunk_size)
+            tasks = ((path, start, end) for start, end in ranges)
+            _convert_in_parallel(
+                tasks, pattern, convert, dest.write, workers
+            )
+    finally:
+        mapped.close()
+
+# Parallel conversion {{{2
+def _split_buffer(buffer, chunk_size):
+    """Split buffer into pieces that can be converted independently.
+
+    The buffer is split just after a newline at or beyond each multiple of
+    chunk_size. A newline can neither be part of a quantity nor prevent one
+    from being recognized, so each piece converts just as it would in place.
+    Returns a list of (start, end) pairs.
+    """
+    ranges = []
     start = 0
-    for match in embedded_engineering_notation.finditer(text):
-        end = match.start(0)
-        number = match.group(0)
+    while start < len(buffer):
+        end = buffer.find(b'\n', start + chunk_size - 1)
+        end = len(buffer) if end < 0 else end + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def _convert_range(task, pattern, convert):
+    # runs in worker process, converts one piece of the file
+    path, start, end = task
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        out = []
         try:
-            number = quant_to_str(number)
-        except ValueError:  # pragma: no cover
-            # something unexpected happened
-            # but this is not essential, so ignore it
-            pass
-        out.append(text[start:end] + number)
-        start = match.end(0)
-    return ''.join(out) + text[start:]
+            _convert_buffer(mapped, pattern, convert, out.append, start, end)
+            return b''.join(out)
+        finally:
+            del out[:]
+            mapped.close()
 
-# Add to namespace {{{1
-assignment = re.compile(
-    r'\A\s*(?:(\w+)\s*=\s*)?(.*?)(?:\s*--\s*(.*?)\s*)?\Z'
-)
+def _convert_in_parallel(tasks, pattern, convert, write, workers):
+    """Convert pieces of a file in worker processes.
 
-def add_to_namespace(quantities):
-    """ Add to Namespace
+    The results are written in order. Only a few pieces beyond the one being
+    written are converted ahead of time, which bounds the memory used.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count()
+    work = partial(_convert_range, pattern=pattern, convert=convert)
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(_prefs(),)
+    ) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(work, task))
+            if len(pending) > 2*workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+def _init_worker(preferences):
+    # the preferences in effect where the conversion was requested become the
+    # global preferences of the worker, statistics are not gathered in workers
+    global _global_preferences, _stats
+    _global_preferences = preferences
+    _stats = None
+
+def file_to_eng_fmt(src, dest, workers=1, chunk_size=2**24):
+    """Convert all quantities found in a file to engineering format.
+
+    src: the path to the input file, or a file opened for reading in binary
+        mode.
+    dest: the path to the output file, or a file opened for writing in binary
+        mode.
+    workers: the number of processes used to convert the file. None uses one
+        per processor. Only used if src is a path, an open file is converted
+        by this process.
+    chunk_size: the approximate size in bytes of the pieces the file is split
+        into when using more than one worker.
+
+    The input file is memory mapped and processed without decoding it, so it
+    may be larger than the available memory. It must be in an ASCII compatible
+    encoding such as UTF-8. The result is the same as all_to_eng_fmt applied
+    to the decoded contents of the file.
+
+    When using multiple workers, the file is split at newlines and the pieces
+    are converted in separate processes that are given the current
+    preferences. The output is identical to that produced by a single worker.
+
+    Raises ValueError if dest is a path to the input file.
+    """
+    _convert_file(
+        src, dest, embedded_floating_point_notation_bytes, _token_to_eng,
+        'quant_to_eng', workers, chunk_size
+    )
 
-    Takes a string that contains quantity definitions and places those
-    quantities in the calling namespace. The string may contain one definition
-    per line, of the form:
-        <name> = <value> -- <description>
-    The description is discarded.
+def file_from_eng_fmt(src, dest, workers=1, chunk_size=2**24):
+    """Convert all quantities found in a file from engineering format.
+
+    src: the path to the input file, or a file opened for reading in binary
+        mode.
+    dest: the path to the output file, or a file opened for writing in binary
+        mode.
+    workers: the number of processes used to convert the file. None uses one
+        per processor. Only used if src is a path, an open file is converted
+        by this process.
+    chunk_size: the approximate size in bytes of the pieces the file is split
+        into when using more than one worker.
+
+    The input file is memory mapped and processed without decoding it, so it
+    may be larger than the available memory. It must be in an ASCII compatible
+    encoding such as UTF-8. The result is the same as all_from_eng_fmt applied
+    to the decoded contents of the file.
+
+    When using multiple workers, the file is split at newlines and the pieces
+    are converted in separate processes that are given the current
+    preferences. The output is identical to that produced by a single worker.
+
+    Raises ValueError if dest is a path to the input file.
     """
-    # Access the namespace of the calling frame
-    import inspect
-    frame = inspect.stack()[1][0]
-    namespace = frame.f_globals
+    _convert_file(
+        src, dest, embedded_engineering_notation_bytes, quant_to_str,
+        'quant_to_str', workers, chunk_size
+    )
 
-    for line in quantities.splitlines():
-        match = assignment.match(line)
+# CSV files {{{2
+# The ways a cell may be converted. Each takes the text of a cell and the
+# ignore_sf preference and returns the value and the units, which are placed in
+# a separate column if units are split. Real numbers are produced directly
+# from the parsed value, without creating a quantity.
+def _cell_to_float(cell, ignore_sf):
+    number, mantissa, sf, units = _parse(cell, '', ignore_sf)
+    return repr(number), units
+
+def _cell_to_eng(cell, ignore_sf):
+    q = Quantity(cell, ignore_sf=ignore_sf)
+    return q.to_eng(), q.units
+
+def _cell_to_unitless_eng(cell, ignore_sf):
+    q = Quantity(cell, ignore_sf=ignore_sf)
+    return q.to_unitless_eng(), q.units
+
+def _cell_to_str(cell, ignore_sf):
+    q = Quantity(cell, ignore_sf=ignore_sf)
+    return q.to_str(), q.units
+
+def _cell_to_unitless_str(cell, ignore_sf):
+    q = Quantity(cell, ignore_sf=ignore_sf)
+    return q.to_unitless_str(), q.units
+
+CSV_DIRECTIONS = {
+    'to_float': (_cell_to_float, _cell_to_float),
+    'to_eng': (_cell_to_eng, _cell_to_unitless_eng),
+    'to_str': (_cell_to_str, _cell_to_unitless_str),
+}
+
+def convert_csv(
+    src, dest, columns=None, direction='to_float', split_units=False,
+    header=True, batch_size=1024, **fmtparams
+):
+    """Convert the quantities in the columns of a CSV file.
+
+    src and dest may be paths or open text files, files should be opened with
+    newline=''. The rows are read, converted and written in batches of
+    batch_size, so the memory used does not depend on the size of the file.
+
+    columns: the columns to convert, given by name (if there is a header) or by
+        index. Negative indices count back from the end of the header, so
+        they require one. The default is to convert all columns. Cells that are empty or
+        do not contain a quantity are copied unchanged.
+    direction: 'to_float' gives the value as a real number without units,
+        'to_eng' gives engineering format and 'to_str' gives floating point
+        notation.
+    split_units: if true, the units of each converted column are placed in
+        a new column that follows it (named '<name> units' in the header).
+    header: whether the first row holds the names of the columns.
+    fmtparams: passed to csv.reader and csv.writer, use delimiter='\t' for
+        TSV files.
+
+    Returns the number of rows converted, not including the header. Raises
+    ValueError if dest is a path to the input file.
+    """
+    if not hasattr(src, 'read'):
+        with open(src, newline='') as src:
+            return convert_csv(
+                src, dest, columns, direction, split_units, header,
+                batch_size, **fmtparams
+            )
+    if not hasattr(dest, 'write'):
+        # opening dest truncates it, so it must not be the input
+        if (
+            hasattr(src, 'fileno') and os.path.exists(dest) and
+            os.path.samestat(os.fstat(src.fileno()), os.stat(dest))
+        ):
+            raise ValueError(
+                '{}: input and output are the same file.'.format(dest)
+            )
+        with open(dest, 'w', newline='') as dest:
+            return convert_csv(
+                src, dest, columns, direction, split_units, header,
+                batch_size, **fmtparams
+            )
+    import csv
+    try:
+        convert = CSV_DIRECTIONS[direction][bool(split_units)]
+    except KeyError:
+        raise ValueError('{}: unknown direction.'.format(direction))
+    reader = csv.reader(src, **fmtparams)
+    writer = csv.writer(dest, **fmtparams)
+
+    names = None
+    if header:
+        names = next(reader, None)
+        if names is None:
+            return 0
+    if columns is not None:
+        indices = []
+        for column in columns:
+            if isinstance(column, int):
+                if column < 0 and names is not None:
+                    # count from the end of the header
+                    column += len(names)
+                if column < 0:
+                    raise ValueError('{}: no such column.'.format(column))
+                indices.append(column)
+            elif names is not None and column in names:
+                indices.append(names.index(column))
+            else:
+                raise ValueError('{}: no such column.'.format(column))
+        columns = sorted(set(indices))
+    if names is not None:
+        selected = range(len(names)) if columns is None else columns
+        if split_units:
+            for index in reversed(selected):
+                if index < len(names):
+                    names.insert(index + 1, names[index] + ' units')
+        writer.writerow(names)
+
+    ignore_sf = _prefs().ignore_sf
+    def convert_cell(cell):
+        if cell:
+            try:
+                return convert(cell, ignore_sf)
+            except ValueError:
+                pass
+        return cell, ''
+
+    count = 0
+    while True:
+        rows = list(islice(reader, batch_size))
+        if not rows:
+            return count
+        count += len(rows)
+        width = max(len(row) for row in rows)
+        selected = range(width) if columns is None else columns
+        # convert a column at a time, then place the results in the rows
+        for index in reversed(selected):
+            if index >= width:
+                continue
+            converted = [
+                convert_cell(row[index]) if index < len(row) else None
+                for row in rows
+            ]
+            for row, cell in zip(rows, converted):
+                if cell is not None:
+                    row[index] = cell[0]
+                    if split_units:
+                        row.insert(index + 1, cell[1])
+        writer.writerows(rows)
+
+# Binary formats {{{1
+# Packing {{{2
+# Used for the deck cache. A sequence of quantities is packed as:
+#     count (uint32)
+#     values (count doubles)
+#     flags (count bytes, padded to a multiple of 4)
+#     offsets (5*count+1 uint32)
+#     text (UTF-8)
+# Each quantity has five strings: mantissa, scale factor, units, name and
+# description. String i of quantity n is text[offsets[5n+i]:offsets[5n+i+1]],
+# where the offsets index the decoded text. The flags indicate which strings
+# are present, those absent are empty in the text. A quantity may also have a
+# description of None, as given by load_quantities() for definitions without
+# one. Numbers are in native byte order.
+_HAS_MANTISSA = 1
+_HAS_UNITS = 2
+_HAS_NAME = 4
+_HAS_DESC = 8
+_NULL_DESC = 16
+_COUNT = struct.Struct('=I')
+
+def _pack_quantities(quantities):
+    "Returns the quantities packed into bytes."
+    values = array('d')
+    flags = bytearray()
+    offsets = array('I', [0])
+    strings = []
+    length = 0
+    for quantity in quantities:
+        values.append(quantity.real)
+        mantissa = getattr(quantity, '_mantissa', None)
+        sf = getattr(quantity, '_scale_factor', None)
+        units = quantity.units
+        name = getattr(quantity, 'name', None)
+        desc = getattr(quantity, 'desc', None)
+        flag = (
+            (_HAS_MANTISSA if mantissa is not None else 0) |
+            (_HAS_UNITS if units is not None else 0) |
+            (_HAS_NAME if name is not None else 0)
+        )
+        if desc is not None:
+            flag |= _HAS_DESC
+        elif hasattr(quantity, 'desc'):
+            flag |= _NULL_DESC
+        flags.append(flag)
+        for string in [mantissa, sf, units, name, desc]:
+            if string:
+                strings.append(string)
+                length += len(string)
+            offsets.append(length)
+    flags.extend(bytes(-len(flags) % 4))
+    return b''.join([
+        _COUNT.pack(len(values)), values.tobytes(), flags, offsets.tobytes(),
+        ''.join(strings).encode('utf8')
+    ])
+
+def _unpack_quantities(buffer, offset=0):
+    """Returns the list of quantities packed into a buffer starting at offset.
+
+    Raises ValueError if the buffer is not consistent.
+    """
+    view = memoryview(buffer).cast('B')[offset:]
+    try:
+        if len(view) < _COUNT.size:
+            raise ValueError('packed quantities are truncated.')
+        count, = _COUNT.unpack_from(view)
+        start = _COUNT.size
+        text_start = start + 8*count + count + (-count % 4) + 4*(5*count+1)
+        if len(view) < text_start:
+            raise ValueError('packed quantities are truncated.')
+        values = view[start:start + 8*count].cast('d').tolist()
+        start += 8*count
+        flags = view[start:start + count].tobytes()
+        start += count + (-count % 4)
+        offsets = view[start:text_start].cast('I').tolist()
+        text = bytes(view[text_start:]).decode('utf8')
+    finally:
+        view.release()
+    # the offsets must ascend from the start to the end of the text
+    if (
+        offsets[0] != 0 or offsets[-1] != len(text) or
+        sorted(offsets) != offsets
+    ):
+        raise ValueError('packed quantities are inconsistent.')
+    if flags.translate(None, bytes(range(32))):
+        raise ValueError('packed quantities have unknown flags.')
+    quantities = []
+    new = float.__new__
+    for n in range(count):
+        i = 5*n
+        quantity = new(Quantity, values[n])
+        flag = flags[n]
+        if flag & _HAS_MANTISSA:
+            quantity._mantissa = text[offsets[i]:offsets[i+1]]
+            quantity._scale_factor = _intern_units(
+                text[offsets[i+1]:offsets[i+2]]
+            ).units
+        quantity.units = (
+            _intern_units(text[offsets[i+2]:offsets[i+3]]).units
+            if flag & _HAS_UNITS else None
+        )
+        if flag & _HAS_NAME:
+            quantity.name = text[offsets[i+3]:offsets[i+4]]
+        if flag & _HAS_DESC:
+            quantity.desc = text[offsets[i+4]:offsets[i+5]]
+        elif flag & _NULL_DESC:
+            quantity.desc = None
+        quantities.append(quantity)
+    return quantities
+
+# Serialization {{{2
+# A portable format for exchanging quantities, all numbers are little endian:
+#     magic (2 bytes), version (uint8), kind (uint8), count (uint32),
+#     number of names (uint32), length of names (uint32)
+#     names (UTF-8, separated by NUL)
+# followed, for a sequence of quantities (kind 0), by:
+#     values (count doubles)
+#     units (count uint16, index into names)
+#     scale factors (count uint16, index into names)
+#     length of mantissas (uint32)
+#     mantissas (ASCII, separated by commas)
+# or, for a block of values that share units (kind 1), by:
+#     values (count doubles)
+# The names are the distinct units and scale factors. Indices start at 1, an
+# index of 0 indicates the units are None or that the quantity has no mantissa
+# and scale factor (it was not given as a string). For a block the units are
+# the first name.
+_SERIAL_HEADER = struct.Struct('<2sBBIII')
+_SERIAL_MAGIC = b'EQ'
+_SERIAL_MANTISSAS = struct.Struct('<I')
+_SERIAL_MAX_NAMES = 0xffff
+
+def _little_endian(numbers):
+    "Converts an array to or from little endian byte order."
+    if sys.byteorder != 'little':  # pragma: no cover
+        numbers.byteswap()
+    return numbers
+
+def dumps_many(quantities):
+    """Serialize quantities.
+
+    quantities may be a QuantityArray or a sequence of Quantity objects, the
+    result is bytes that loads_many() converts back. The value, units,
+    mantissa and scale factor of each quantity are preserved, so strip() and
+    to_str() give exactly what they did originally. Names and descriptions are
+    not preserved.
+    """
+    if isinstance(quantities, QuantityArray):
+        names = [quantities.units]
+        if names[0] is None:
+            names = []
+        text = '\0'.join(names).encode('utf8')
+        return b''.join([
+            _SERIAL_HEADER.pack(
+                _SERIAL_MAGIC, 1, 1, len(quantities), len(names), len(text)
+            ),
+            text,
+            _little_endian(array('d', quantities.values)).tobytes(),
+        ])
+
+    values = array('d')
+    unit_ids = array('H')
+    sf_ids = array('H')
+    mantissas = []
+    ids = {None: 0}
+    for quantity in quantities:
+        values.append(quantity.real)
+        mantissa = getattr(quantity, '_mantissa', None)
+        for name, indices in [
+            (quantity.units, unit_ids),
+            (None if mantissa is None else quantity._scale_factor, sf_ids)
+        ]:
+            index = ids.get(name)
+            if index is None:
+                if '\0' in name:
+                    raise ValueError('{!r}: units contain NUL.'.format(name))
+                index = ids[name] = len(ids)
+                if index > _SERIAL_MAX_NAMES:
+                    raise ValueError('too many distinct units.')
+            indices.append(index)
+        if mantissa is not None:
+            mantissas.append(mantissa)
+    del ids[None]
+    text = '\0'.join(ids).encode('utf8')
+    mantissas = ','.join(mantissas).encode('ascii')
+    return b''.join([
+        _SERIAL_HEADER.pack(
+            _SERIAL_MAGIC, 1, 0, len(values), len(ids), len(text)
+        ),
+        text,
+        _little_endian(values).tobytes(),
+        _little_endian(unit_ids).tobytes(),
+        _little_endian(sf_ids).tobytes(),
+        _SERIAL_MANTISSAS.pack(len(mantissas)),
+        mantissas,
+    ])
+
+def loads_many(data):
+    """Deserialize quantities serialized by dumps_many().
+
+    Returns a list of Quantity objects, or a QuantityArray if a QuantityArray
+    was serialized. Raises ValueError if data is not valid.
+    """
+    def section(size):
+        # returns the next size bytes
+        nonlocal start
+        if start + size > len(view):
+            raise ValueError('truncated serialized quantities.')
+        piece = bytes(view[start:start + size])
+        start += size
+        return piece
+
+    def split(text, separator, expected):
+        # returns the pieces of the text, which must number expected
+        pieces = text.split(separator) if expected else []
+        if len(pieces) != expected or (not expected and text):
+            raise ValueError('inconsistent serialized quantities.')
+        return pieces
+
+    view = memoryview(data).cast('B')
+    try:
+        magic, version, kind, count, num_names, length = (
+            _SERIAL_HEADER.unpack_from(view)
+        )
+        if magic != _SERIAL_MAGIC or version != 1 or kind not in (0, 1):
+            raise ValueError('not serialized quantities.')
+        start = _SERIAL_HEADER.size
+        names = [
+            _intern_units(name).units
+            for name in split(section(length).decode('utf8'), '\0', num_names)
+        ]
+        values = _little_endian(array('d', section(8*count)))
+
+        if kind == 1:
+            if num_names > 1 or start != len(view):
+                raise ValueError('inconsistent serialized quantities.')
+            return QuantityArray(values, names[0] if names else None)
+
+        unit_ids = _little_endian(array('H', section(2*count)))
+        sf_ids = _little_endian(array('H', section(2*count)))
+        length, = _SERIAL_MANTISSAS.unpack(section(_SERIAL_MANTISSAS.size))
+        mantissas = section(length).decode('ascii')
+        if start != len(view):
+            raise ValueError('inconsistent serialized quantities.')
+    except struct.error:
+        raise ValueError('truncated serialized quantities.')
+    finally:
+        view.release()
+
+    # an index of 0 indicates a missing name, so ids may not exceed num_names
+    if count and max(max(unit_ids), max(sf_ids)) > num_names:
+        raise ValueError('inconsistent serialized quantities.')
+    mantissas = iter(split(mantissas, ',', count - sf_ids.count(0)))
+    names.insert(0, None)
+    quantities = []
+    new = float.__new__
+    for value, unit_id, sf_id in zip(values, unit_ids, sf_ids):
+        quantity = new(Quantity, value)
+        quantity.units = names[unit_id]
+        if sf_id:
+            quantity._mantissa = next(mantissas)
+            quantity._scale_factor = names[sf_id]
+        quantities.append(quantity)
+    return quantities
+
+def dumps(quantity):
+    "Serialize a quantity, see dumps_many()."
+    return dumps_many([quantity])
+
+def loads(data):
+    "Deserialize a quantity serialized by dumps()."
+    quantities = loads_many(data)
+    if len(quantities) != 1:
+        raise ValueError('not a serialized quantity.')
+    return quantities[0]
+
+# Add to namespace {{{1
+assignment = _LazyPattern(DEFAULT_ASSIGNMENT_RECOGNIZER, 'assignment')
+
+def load_quantities(deck, cache_dir=None):
+    """ Load Quantities
+
+    Takes quantity definitions and returns a dictionary that maps each name to
+    its quantity, in the order they were defined. The definitions may be given
+    as a string, as a file or other iterable that produces lines, or as the
+    path to a file (a pathlib.Path or other os.PathLike). Files are read a line
+    at a time, so large files need not be held in memory. There may be one
+    definition per line, which is recognized using the assign_rec preference.
+    By default the definitions take the form:
+        <name> = <value> -- <description>
+    The name and description are attached to the quantity. Lines without a
+    value, such as blank lines and comments (lines that start with --), are
+    skipped.
+
+    If cache_dir is given and the deck is given as a path, the quantities are
+    saved in a cache file in that directory and later loads of the same deck
+    read the cache rather than parsing the deck again. The cache is used only
+    if the deck is unchanged and was parsed with the same ignore_sf and
+    assign_rec preferences, otherwise it is replaced.
+    """
+    if isinstance(deck, os.PathLike):
+        if cache_dir is not None:
+            return _load_cached_deck(deck, cache_dir)
+        with open(deck) as lines:
+            return load_quantities(lines)
+    lines = deck.splitlines() if is_str(deck) else deck
+    recognizer = _prefs().assign_rec
+    quantities = {}
+    for line in lines:
+        match = recognizer.match(line.rstrip('\n'))
         if match:
             name, value, desc = match.groups()
             if not value:
@@ -684,8 +2531,326 @@ def add_to_namespace(quantities):
             if not name:
                 raise ValueError('{}: no variable name given.'.format(line))
             quantity = Quantity(value)
-            quantity.add_name(name)
-            quantity.add_desc(desc)
-            namespace[name] = quantity
+            quantity.name = name
+            quantity.desc = desc
+            quantities[name] = quantity
         else:  # pragma: no cover
             raise ValueError('{}: not a valid number.'.format(line))
+    return quantities
+
+# Deck cache {{{2
+# A cache file contains a header followed by the packed quantities. The header
+# holds the modification time and size of the deck, a digest of its contents,
+# a digest of the preferences that affect parsing, and a checksum of the packed
+# quantities. If the time and size match, the deck is assumed to be unchanged,
+# otherwise the digest is checked, and if it matches the time and size in the
+# header are updated. A cache that is damaged is treated as missing, so it is
+# replaced.
+_DECK_CACHE_MAGIC = 0x45464443  # a byte order mismatch also changes this
+_DECK_CACHE_VERSION = 2
+_DECK_CACHE_HEADER = struct.Struct('=IIqQ32s32sI')
+_DECK_CACHE_STAT = struct.Struct('=qQ')  # the time and size within the header
+_DECK_CACHE_STAT_OFFSET = struct.calcsize('=II')
+
+def _deck_cache_path(deck, cache_dir):
+    import hashlib
+    path = os.path.abspath(os.fspath(deck))
+    name = hashlib.sha256(path.encode('utf8', 'surrogateescape')).hexdigest()
+    return os.path.join(os.fspath(cache_dir), name[:32] + '.deck')
+
+def _read_deck_cache(cache_path, deck_file, pref_digest):
+    """Returns the cached quantities, or None if the cache is not valid."""
+    import hashlib
+    import zlib
+    try:
+        with open(cache_path, 'rb') as cache:
+            mapped = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # the cache does not exist or is empty
+        return None
+    try:
+        magic, version, mtime, size, digest, prefs_digest, checksum = (
+            _DECK_CACHE_HEADER.unpack_from(mapped)
+        )
+        if magic != _DECK_CACHE_MAGIC or version != _DECK_CACHE_VERSION:
+            return None
+        if prefs_digest != pref_digest:
+            return None
+        status = os.fstat(deck_file.fileno())
+        stale = (mtime, size) != (status.st_mtime_ns, status.st_size)
+        if stale:
+            contents = deck_file.read()
+            deck_file.seek(0)
+            if hashlib.sha256(contents).digest() != digest:
+                return None
+        packed = memoryview(mapped)[_DECK_CACHE_HEADER.size:]
+        try:
+            if zlib.crc32(packed) != checksum:
+                return None
+        finally:
+            packed.release()
+        quantities = _unpack_quantities(mapped, _DECK_CACHE_HEADER.size)
+    except (struct.error, ValueError):
+        # the cache is corrupt
+        return None
+    finally:
+        mapped.close()
+
+    if stale:
+        # the deck was touched but not changed, record its new time and size so
+        # that later loads need not check its digest again
+        try:
+            with open(cache_path, 'r+b') as cache:
+                cache.seek(_DECK_CACHE_STAT_OFFSET)
+                cache.write(_DECK_CACHE_STAT.pack(
+                    status.st_mtime_ns, status.st_size
+                ))
+        except OSError:
+            pass
+    return quantities
+
+def _load_cached_deck(deck, cache_dir):
+    # only needed for the cache, so imported here to keep importing fast
+    import hashlib
+    import zlib
+    prefs = _prefs()
+    pref_digest = hashlib.sha256(repr(
+        (bool(prefs.ignore_sf), prefs.assign_rec.pattern)
+    ).encode('utf8')).digest()
+    cache_path = _deck_cache_path(deck, cache_dir)
+
+    with open(deck, 'rb') as f:
+        quantities = _read_deck_cache(cache_path, f, pref_digest)
+        if quantities is not None:
+            return {quantity.name: quantity for quantity in quantities}
+        status = os.fstat(f.fileno())
+        contents = f.read()
+
+    # decode the deck just as it would be if it were opened as text
+    quantities = load_quantities(io.TextIOWrapper(io.BytesIO(contents)))
+    packed = _pack_quantities(quantities.values())
+    header = _DECK_CACHE_HEADER.pack(
+        _DECK_CACHE_MAGIC, _DECK_CACHE_VERSION, status.st_mtime_ns,
+        status.st_size, hashlib.sha256(contents).digest(), pref_digest,
+        zlib.crc32(packed)
+    )
+    try:
+        os.makedirs(os.fspath(cache_dir), exist_ok=True)
+        # write to a temporary file and then rename, so that other processes
+        # never see a partially written cache
+        temp = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(temp, 'wb') as cache:
+            cache.write(header)
+            cache.write(packed)
+        os.replace(temp, cache_path)
+    except OSError:
+        # the cache is an optimization, failing to write it is not an error
+        pass
+    return quantities
+
+def add_to_namespace(quantities):
+    """ Add to Namespace
+
+    Takes a string that contains quantity definitions and places those
+    quantities in the calling namespace. The string may contain one definition
+    per line, of the form:
+        <name> = <value> -- <description>
+    The definitions may also be given in any of the forms accepted by
+    load_quantities().
+    """
+    # Access the namespace of the calling frame
+    namespace = sys._getframe(1).f_globals
+    namespace.update(load_quantities(quantities))
+
+# Command line interface {{{1
+def main(args=None):
+    """Convert quantities from the command line.
+
+    Usage:
+        engfmt to-eng [options] [<file>...]
+        engfmt from-eng [options] [<file>...]
+        engfmt parse [options] [<file>...]
+        engfmt csv [options] [<file>...]
+
+    to-eng and from-eng convert the quantities found in the files, or in the
+    standard input if no files are given, and write the result to the
+    standard output (or into a directory if --dest is given). parse reads one
+    quantity per line and writes its value and units separated by a tab. csv
+    converts the quantities in the columns of CSV files.
+    """
+    import argparse
+    import time
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='*', help='input files')
+    common.add_argument(
+        '--prec', type=int, default=False, help='human precision'
+    )
+    common.add_argument(
+        '--spacer', default=False, help='text between number and units'
+    )
+    common.add_argument(
+        '--output-sf', default=False, metavar='SF',
+        help='scale factors to output'
+    )
+    common.add_argument(
+        '--ignore-sf', action='store_true', help='ignore scale factors'
+    )
+    common.add_argument(
+        '--stats', action='store_true',
+        help='report throughput on standard error'
+    )
+    parser = argparse.ArgumentParser(
+        prog='engfmt', description='Convert to and from engineering format.'
+    )
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+    for name, desc in [
+        ('to-eng', 'convert quantities to engineering format'),
+        ('from-eng', 'convert quantities from engineering format'),
+    ]:
+        command = commands.add_parser(name, parents=[common], help=desc)
+        command.add_argument(
+            '--dest', metavar='DIR',
+            help='write each converted file into this directory'
+        )
+        command.add_argument(
+            '--workers', type=int, default=1,
+            help='number of processes used per file'
+        )
+    commands.add_parser(
+        'parse', parents=[common], help='write value and units of quantities'
+    )
+    command = commands.add_parser(
+        'csv', parents=[common], help='convert quantities in CSV columns'
+    )
+    command.add_argument(
+        '--columns', metavar='COLS',
+        help='comma separated names (or indices with --no-header) of the '
+             'columns to convert, default is all'
+    )
+    command.add_argument(
+        '--to', choices=['float', 'eng', 'str'], default='float',
+        help='convert to real numbers (default), engineering format or '
+             'floating point notation'
+    )
+    command.add_argument(
+        '--split-units', action='store_true',
+        help='put units in a separate column'
+    )
+    command.add_argument(
+        '--tsv', action='store_true', help='columns are separated by tabs'
+    )
+    command.add_argument(
+        '--no-header', action='store_true',
+        help='first row holds data rather than column names'
+    )
+    command.add_argument(
+        '--dest', metavar='DIR',
+        help='write each converted file into this directory'
+    )
+    args = parser.parse_args(args)
+    set_preferences(
+        hprec=args.prec, spacer=args.spacer, output=args.output_sf,
+        ignore_sf=args.ignore_sf or 0
+    )
+
+    start = time.time()
+    processed = 0
+    status = 0
+    if args.command == 'parse':
+        def lines():
+            if not args.files:
+                for line in sys.stdin:
+                    yield line
+            for path in args.files:
+                with open(path) as f:
+                    for line in f:
+                        yield line
+        for line in lines():
+            processed += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                value, units = quant_to_tuple(line)
+                sys.stdout.write('{!r}\t{}\n'.format(value, units))
+            except ValueError as err:
+                sys.stderr.write('engfmt: {}\n'.format(err))
+                status = 1
+    elif args.command == 'csv':
+        columns = None
+        if args.columns:
+            columns = args.columns.split(',')
+            if args.no_header:
+                # without a header the columns can only be given by index
+                indices = []
+                for column in columns:
+                    try:
+                        indices.append(int(column))
+                    except ValueError:
+                        sys.stderr.write(
+                            'engfmt: {}: no such column.\n'.format(column)
+                        )
+                        return 1
+                columns = indices
+        def convert(src, dest):
+            try:
+                convert_csv(
+                    src, dest, columns, 'to_' + args.to, args.split_units,
+                    not args.no_header, delimiter='\t' if args.tsv else ','
+                )
+                return 0
+            except ValueError as err:
+                sys.stderr.write('engfmt: {}\n'.format(err))
+                return 1
+        if not args.files:
+            status |= convert(sys.stdin, sys.stdout)
+        for path in args.files:
+            if args.dest:
+                dest = os.path.join(args.dest, os.path.basename(path))
+            else:
+                dest = sys.stdout
+            status |= convert(path, dest)
+            processed += os.path.getsize(path)
+        sys.stdout.flush()
+    else:
+        if args.command == 'to-eng':
+            converter = _StreamConverter(all_to_eng_fmt)
+            convert = file_to_eng_fmt
+        else:
+            converter = _StreamConverter(all_from_eng_fmt)
+            convert = file_from_eng_fmt
+        if not args.files:
+            for chunk in iter(partial(sys.stdin.read, 65536), ''):
+                processed += len(chunk)
+                text = converter.feed(chunk)
+                sys.stdout.write(text)
+            sys.stdout.write(converter.flush())
+        for path in args.files:
+            if args.dest:
+                dest = os.path.join(args.dest, os.path.basename(path))
+            else:
+                sys.stdout.flush()
+                dest = sys.stdout.buffer
+            try:
+                convert(path, dest, workers=args.workers)
+            except ValueError as err:
+                sys.stderr.write('engfmt: {}\n'.format(err))
+                status = 1
+                continue
+            processed += os.path.getsize(path)
+        sys.stdout.flush()
+
+    if args.stats:
+        elapsed = time.time() - start
+        sys.stderr.write(
+            'engfmt: processed {} in {:.3f}s ({}/s)\n'.format(
+                Quantity(processed, 'B'), elapsed,
+                Quantity(processed/max(elapsed, 1e-9), 'B')
+            )
+        )
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,7 +19,8 @@ setup(
     license='GPLv3+',
     zip_safe=True,
     py_modules=['engfmt'],
-    install_requires=['six'],
+    entry_points={'console_scripts': ['engfmt=engfmt:main']},
+    python_requires='>=3.7',
     setup_requires=['pytest-runner>=2.0'],
     tests_require=['pytest'],
     keywords=[
@@ -32,11 +33,11 @@ setup(
         'License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)',
         'Natural Language :: English',
         'Operating System :: POSIX :: Linux',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Utilities',
         'Topic :: Scientific/Engineering',
     ],
@@ -0,0 +1,60 @@
+import pytest
+from engfmt import Quantity, parse_many, set_preferences
+from test_quantity import test_cases
+np = pytest.importorskip('numpy')
+
+def test_parse_many():
+    set_preferences(ignore_sf=None)
+    texts = [case.text for case in test_cases]
+    numbers, units, invalid = parse_many(texts)
+    assert numbers.dtype == np.float64
+    for text, number, unit, bad in zip(texts, numbers, units, invalid):
+        try:
+            q = Quantity(text)
+        except ValueError:
+            assert bad, text
+            assert np.isnan(number), text
+            continue
+        assert not bad, text
+        assert unit == q.units, text
+        assert number == q.to_float() or (np.isnan(number) and q.is_nan()), text
+
+    numbers, units, invalid = parse_many(np.array(['1.5MHz', '3 MHz', '1e3Hz']))
+    assert numbers.tolist() == [1.5e6, 3e6, 1e3]
+    assert units == 'Hz'
+    assert not invalid.any()
+
+    numbers, units, invalid = parse_many(['1mA', 'xxx', 2.5, 'c', '1e-9 V'], 'A')
+    assert numbers[0] == 1e-3
+    assert numbers[2] == 2.5
+    assert invalid.tolist() == [False, True, False, True, True]
+    assert units == 'A'
+
+    numbers, units, invalid = parse_many(['1ms', '2 ks'], ignore_sf=True)
+    assert numbers.tolist() == [1, 2]
+    assert units.tolist() == ['ms', 'ks']
+
+def test_format_many():
+    from engfmt import format_many
+    values = [
+        0, 1, -1.5, 999.96, 1e-24, 1e24, 1e30, -1e-30, 1420405751.786,
+        float('inf'), -float('inf'), float('nan'), -0.0, 0.125, 2.5e-9,
+        9.9995, 5e-324, 1.7976931348623157e308,
+    ]
+    values += [10**(e/3) for e in range(-90, 90)]
+    values += [(n + 0.5) / 8 for n in range(-40, 40)]
+    try:
+        for prefs in [{}, {'unity': '_'}, {'output': ''}]:
+            set_preferences(**prefs)
+            for units in ['', 'Hz', '$']:
+                for prec in [None, 0, 1, 2, 12, 20]:
+                    results = format_many(values, units, prec)
+                    assert results.tolist() == [
+                        Quantity(value, units).to_eng(prec) for value in values
+                    ], (prefs, units, prec)
+    finally:
+        set_preferences(unity=None, output=None)
+
+    results = format_many(np.array([[1e-9, 2.5e6], [3, 4]]), 's')
+    assert results.shape == (2, 2)
+    assert format_many([]).tolist() == []
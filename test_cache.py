@@ -0,0 +1,109 @@
+from engfmt import (
+    Quantity, set_preferences, set_parse_cache, parse_cache_info,
+    clear_parse_cache, set_token_memo, token_memo_info, clear_token_memo,
+    all_to_eng_fmt, all_from_eng_fmt, preferences, set_stats, stats,
+)
+
+def test_parse_cache():
+    set_preferences(ignore_sf=None)
+    assert parse_cache_info() is None
+    set_parse_cache(2)
+    try:
+        assert Quantity('1ns').to_tuple() == (1e-9, 's')
+        assert Quantity('1ns').to_tuple() == (1e-9, 's')
+        assert Quantity('1ns').strip() == '1n'
+        info = parse_cache_info()
+        assert (info.hits, info.misses, info.evictions) == (2, 1, 0)
+        assert (info.maxsize, info.currsize) == (2, 1)
+
+        # constants are not cached
+        assert Quantity('c').units == 'm/s'
+        assert parse_cache_info().currsize == 1
+
+        # least recently used entry is evicted
+        Quantity('2V')
+        Quantity('3A')
+        info = parse_cache_info()
+        assert (info.evictions, info.currsize) == (1, 2)
+
+        # changing ignore_sf must not return stale results
+        Quantity('1ms')
+        set_preferences(ignore_sf=True)
+        assert Quantity('1ms').to_tuple() == (1, 'ms')
+        set_preferences(ignore_sf=None)
+        assert Quantity('1ms').to_tuple() == (1e-3, 's')
+
+        clear_parse_cache()
+        info = parse_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+    finally:
+        set_parse_cache(None)
+        set_preferences(ignore_sf=None)
+    assert parse_cache_info() is None
+
+def test_token_memo():
+    assert token_memo_info() is None
+    set_token_memo(3)
+    try:
+        with preferences(spacer=''):
+            text = 'a 1e-9s b 1e-9s c 2e3V 1e-9s'
+            assert all_to_eng_fmt(text) == 'a 1ns b 1ns c 2kV 1ns'
+            info = token_memo_info()
+            assert (info.hits, info.misses, info.evictions) == (2, 2, 0)
+            assert (info.maxsize, info.currsize) == (3, 2)
+
+            assert all_to_eng_fmt(text) == 'a 1ns b 1ns c 2kV 1ns'
+            assert all_from_eng_fmt('1ns 1ns') == '1e-9s 1e-9s'
+            info = token_memo_info()
+            assert (info.hits, info.misses, info.currsize) == (7, 3, 3)
+
+        # entries are specific to the preferences
+        with preferences(spacer=' '):
+            assert all_to_eng_fmt(text) == 'a 1 ns b 1 ns c 2 kV 1 ns'
+        with preferences(spacer=' ', hprec=1, ignore_sf=True):
+            assert all_to_eng_fmt('1.24e-9s 1.24e-9s') == '1.2 ns 1.2 ns'
+            assert all_from_eng_fmt('1ns 1ns') == '1 ns 1 ns'
+
+        # a full table is emptied
+        with preferences(spacer=''):
+            assert all_to_eng_fmt('1A 2A 3A 4A 1A') == '1A 2A 3A 4A 1A'
+        info = token_memo_info()
+        assert info.evictions == 4
+
+        # hits are reported in the statistics
+        set_stats(True)
+        with preferences(spacer=''):
+            all_from_eng_fmt('1ns 1ns 2ns')
+        text = stats()['text']
+        assert (text['matches'], text['memo_hits'], text['memo_misses']) == (
+            3, 2, 1
+        )
+
+        clear_token_memo()
+        info = token_memo_info()
+        assert (info.hits, info.misses, info.currsize) == (0, 0, 0)
+    finally:
+        set_stats(False)
+        set_token_memo(None)
+    assert token_memo_info() is None
+
+def test_token_memo_threads():
+    import threading
+    # each thread converts its own quantities twice, so half are hits
+    def convert(thread):
+        text = ' '.join('{}.{}V'.format(thread, i) for i in range(2000))
+        for i in range(2):
+            all_to_eng_fmt(text)
+    set_token_memo(100000)
+    try:
+        threads = [
+            threading.Thread(target=convert, args=(i,)) for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = token_memo_info()
+        assert (info.hits, info.misses) == (16000, 16000)
+    finally:
+        set_token_memo(None)
@@ -0,0 +1,122 @@
+from io import StringIO
+import sys
+import pytest
+from engfmt import main, preferences
+
+def run(args, stdin, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'stdin', StringIO(stdin))
+    # confine the preferences set by main to this call
+    with preferences():
+        status = main(args)
+    out, err = capsys.readouterr()
+    return status, out, err
+
+def test_cli(monkeypatch, capsys, tmp_path):
+    status, out, err = run(
+        ['to-eng', '--spacer', ' ', '--stats'], 'a 1.5e-9s b\n',
+        monkeypatch, capsys
+    )
+    assert (status, out) == (0, 'a 1.5 ns b\n')
+    assert err.startswith('engfmt: processed 12 B')
+
+    status, out, err = run(
+        ['from-eng', '--spacer', ''], 'a 1.5ns b', monkeypatch, capsys
+    )
+    assert (status, out) == (0, 'a 1.5e-9s b')
+
+    status, out, err = run(
+        ['parse'], '1ms\n\n2.5 GHz\nxx\n', monkeypatch, capsys
+    )
+    assert status == 1
+    assert out == '0.001\ts\n2500000000.0\tHz\n'
+    assert err == 'engfmt: xx: not a valid number.\n'
+
+    status, out, err = run(['parse', '--ignore-sf'], '1ms', monkeypatch, capsys)
+    assert out == '1.0\tms\n'
+
+    src = tmp_path / 'in.txt'
+    src.write_text('x = 1.23456e3 Ohms\n')
+    status, out, err = run(
+        ['to-eng', '--prec', '2', '--spacer', ' ', str(src), str(src)], '',
+        monkeypatch, capsys
+    )
+    assert out == 'x = 1.23k Ohms\n' * 2
+
+    dest = tmp_path / 'out'
+    dest.mkdir()
+    status, out, err = run(
+        ['to-eng', '--output-sf', '', '--dest', str(dest), str(src)], '',
+        monkeypatch, capsys
+    )
+    assert (dest / 'in.txt').read_text() == 'x = 1.2346e3 Ohms\n'
+
+    with pytest.raises(SystemExit):
+        run([], '', monkeypatch, capsys)
+
+def test_cli_same_file(monkeypatch, capsys, tmp_path):
+    # writing into the directory of the input must not destroy it
+    src = tmp_path / 'a.log'
+    src.write_text('x = 1e3 V\n')
+    status, out, err = run(
+        ['to-eng', '--dest', str(tmp_path), str(src)], '', monkeypatch, capsys
+    )
+    assert status == 1
+    assert err == 'engfmt: {}: input and output are the same file.\n'.format(
+        src
+    )
+    assert src.read_text() == 'x = 1e3 V\n'
+
+    from engfmt import file_to_eng_fmt
+    with pytest.raises(ValueError):
+        file_to_eng_fmt(str(src), str(src))
+    assert src.read_text() == 'x = 1e3 V\n'
+
+def test_cli_csv_same_file(monkeypatch, capsys, tmp_path):
+    src = tmp_path / 'b.csv'
+    src.write_text('R1,1.2mA\n')
+    status, out, err = run(
+        ['csv', '--no-header', '--dest', str(tmp_path), str(src)], '',
+        monkeypatch, capsys
+    )
+    assert status == 1
+    assert err == 'engfmt: {}: input and output are the same file.\n'.format(
+        src
+    )
+    assert src.read_text() == 'R1,1.2mA\n'
+
+def test_cli_csv(monkeypatch, capsys, tmp_path):
+    data = 'name\tI\nR1\t1.2mA\n'
+    status, out, err = run(
+        ['csv', '--tsv', '--columns', 'I', '--to', 'eng', '--split-units',
+         '--spacer', ' '],
+        data, monkeypatch, capsys
+    )
+    assert status == 0
+    assert out.splitlines() == ['name\tI\tI units', 'R1\t1.2m\tA']
+
+    status, out, err = run(
+        ['csv', '--tsv', '--no-header', '--columns', '1'], data,
+        monkeypatch, capsys
+    )
+    assert out.splitlines() == ['name\tI', 'R1\t0.0012']
+
+    src = tmp_path / 'in.csv'
+    src.write_text('R1,1.2mA\n')
+    dest = tmp_path / 'out'
+    dest.mkdir()
+    status, out, err = run(
+        ['csv', '--no-header', '--dest', str(dest), str(src)], '',
+        monkeypatch, capsys
+    )
+    assert (dest / 'in.csv').read_text().splitlines() == ['R1,0.0012']
+
+    status, out, err = run(
+        ['csv', '--columns', 'V'], 'name,I\n', monkeypatch, capsys
+    )
+    assert (status, err) == (1, 'engfmt: V: no such column.\n')
+
+    status, out, err = run(
+        ['csv', '--no-header', '--columns', '0,a'], 'R1,1.2mA\n', monkeypatch,
+        capsys
+    )
+    assert (status, out, err) == (1, '', 'engfmt: a: no such column.\n')
@@ -0,0 +1,83 @@
+from io import StringIO
+import pytest
+from engfmt import convert_csv, preferences
+
+DATA = 'name,current,voltage\nR1,1.2mA,3.3 V\nR2,,bad\nR3,2.5e-3A,$10\n'
+
+def convert(data, *args, **kwargs):
+    dest = StringIO(newline='')
+    count = convert_csv(StringIO(data, newline=''), dest, *args, **kwargs)
+    return count, dest.getvalue().replace('\r\n', '\n')
+
+def test_directions():
+    with preferences(spacer=''):
+        count, out = convert(DATA, ['current', 2])
+        assert count == 3
+        assert out == (
+            'name,current,voltage\nR1,0.0012,3.3\nR2,,bad\nR3,0.0025,10.0\n'
+        )
+        count, out = convert(DATA, ['current', 2], 'to_eng')
+        assert out == (
+            'name,current,voltage\nR1,1.2mA,3.3V\nR2,,bad\nR3,2.5mA,$10\n'
+        )
+        count, out = convert(DATA, ['voltage'], 'to_str')
+        assert out == (
+            'name,current,voltage\nR1,1.2mA,3.3V\nR2,,bad\nR3,2.5e-3A,$10\n'
+        )
+    with pytest.raises(ValueError):
+        convert(DATA, direction='to_hex')
+
+def test_split_units():
+    count, out = convert(DATA, ['current', 'voltage'], 'to_eng', True)
+    assert out == (
+        'name,current,current units,voltage,voltage units\n'
+        'R1,1.2m,A,3.3,V\n'
+        'R2,,,bad,\n'
+        'R3,2.5m,A,10,$\n'
+    )
+    count, out = convert(DATA, ['current'], split_units=True, batch_size=1)
+    assert count == 3
+    assert out == (
+        'name,current,current units,voltage\n'
+        'R1,0.0012,A,3.3 V\n'
+        'R2,,,bad\n'
+        'R3,0.0025,A,$10\n'
+    )
+
+def test_columns():
+    # all columns, names are not quantities so they are copied
+    count, out = convert(DATA)
+    assert out == (
+        'name,current,voltage\nR1,0.0012,3.3\nR2,,bad\nR3,0.0025,10.0\n'
+    )
+
+    # no header, so columns are given by index; short rows are left alone
+    data = '1k\t2k\n3M\n'
+    count, out = convert(
+        data, [1], header=False, split_units=True, delimiter='\t'
+    )
+    assert count == 2
+    assert out == '1k\t2000.0\t\n3M\n'
+
+    # negative indices count from the end of the header
+    count, out = convert(DATA, [-1], 'to_eng', True)
+    assert out.splitlines()[:2] == [
+        'name,current,voltage,voltage units', 'R1,1.2mA,3.3,V'
+    ]
+    with pytest.raises(ValueError):
+        convert(DATA, [-4])
+    with pytest.raises(ValueError):
+        convert(data, [-1], header=False, delimiter='\t')
+
+    with pytest.raises(ValueError):
+        convert(DATA, ['power'])
+    with pytest.raises(ValueError):
+        convert(DATA, ['current'], header=False)
+    assert convert('', ['current']) == (0, '')
+
+def test_files(tmp_path):
+    src = tmp_path / 'in.csv'
+    dest = tmp_path / 'out.csv'
+    src.write_text(DATA)
+    assert convert_csv(str(src), str(dest), [1]) == 3
+    assert dest.read_text().splitlines()[1] == 'R1,0.0012,3.3 V'
@@ -21,3 +21,23 @@ def test_format():
 
     q=Quantity('2n')
     assert float(q) == 2e-9
+
+def test_format_widths():
+    q=Quantity('1420.405751786 MHz')
+    q.add_name('f')
+    assert '{:>12q}'.format(q) == '  1.4204 GHz'
+    assert '{:<12.2q}'.format(q) == '1.42 GHz    '
+    assert '{:12r}'.format(q) == '1.4204G     '
+    assert '{:>4u}'.format(q) == '  Hz'
+    assert '{:>15.1R}'.format(q) == '       f = 1.4G'
+    assert '{:>15.3e}'.format(q) == '      1.420e+09'
+    assert '[{:>3}]'.format(Quantity('2n')) == '[ 2n]'
+
+def test_format_cache():
+    from engfmt import preferences
+    q=Quantity('1420.405751786 MHz')
+    assert '{:.2q}'.format(q) == '1.42 GHz'
+    # the cached spec uses the preferences in effect when it is applied
+    with preferences(spacer=''):
+        assert '{:.2q}'.format(q) == '1.42GHz'
+    assert '{:.2q}'.format(q) == '1.42 GHz'
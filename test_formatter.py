@@ -0,0 +1,36 @@
+# encoding: utf8
+
+from engfmt import Formatter, Quantity, preferences
+
+def test_formatter():
+    fmt = Formatter(prec=2, spacer=' ')
+    assert fmt.eng(1.4204e9, 'Hz') == '1.42 GHz'
+    assert fmt.eng(-1.4204e9) == '-1.42G'
+    assert fmt.eng(4.7e-30, 'F') == '4.7e-30 F'
+    assert fmt.eng(250, 'V') == '250 V'
+    assert fmt.eng(10.5, '$') == '$10.5'
+    assert fmt.eng(float('inf'), 'Hz') == 'inf Hz'
+    assert fmt.sci(1.4204e9, 'Hz') == '1.42×10⁰⁹ Hz'
+    assert fmt.sci(-4.7e-300, 'F') == '-4.70×10⁻³⁰⁰ F'
+    assert fmt.sci(float('nan')) == 'nan'
+    assert fmt.str(1.4204e9, 'Hz') == '1.4204e+09 Hz'
+
+    fmt = Formatter(prec=4, spacer='', unity='_', output='kMG')
+    assert fmt.eng(2.5e12, 'Hz') == '2.5e12Hz'
+    assert fmt.eng(2.5e-3, 's') == '2.5e-3s'
+    assert fmt.eng(25, 's') == '25_s'
+    assert fmt.eng(25, '$') == '$25'
+    assert fmt.eng(25) == '25'
+
+def test_formatter_matches_quantity():
+    values = [0, 1, -1e-3, 1.4204e9, 999.96, 1e-25, 3.2e27, 47e3]
+    for spacer in ['', ' ']:
+        for prec in [0, 2, 4]:
+            with preferences(spacer=spacer, unity='_', hprec=prec):
+                fmt = Formatter()
+                for value in values:
+                    for units in ['', 'Hz', '$']:
+                        q = Quantity(value, units)
+                        assert fmt.eng(value, units) == q.to_eng()
+                        assert fmt.sci(value, units) == q.to_sci()
+                        assert fmt.str(value, units) == q.to_str()
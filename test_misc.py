@@ -68,3 +68,48 @@ def test_misc():
 
     with pytest.raises(ValueError):
         add_to_namespace('x*y = z')
+
+def test_lazy_patterns():
+    import pickle
+    import re
+    import subprocess
+    import sys
+    # patterns are not compiled on import, only when first used
+    script = '; '.join([
+        'import engfmt, re',
+        'assert not isinstance(engfmt.format_spec, re.Pattern)',
+        'assert not isinstance(engfmt.all_number_recognizer, re.Pattern)',
+        'assert format(engfmt.Quantity("1ns"), "q") == "1ns"',
+        'assert isinstance(engfmt.format_spec, re.Pattern)',
+        'assert isinstance(engfmt.all_number_recognizer, re.Pattern)',
+        'assert "six" not in __import__("sys").modules',
+    ])
+    subprocess.check_call([sys.executable, '-c', script])
+
+    from engfmt import _LazyPattern
+    lazy = _LazyPattern(r'\d+')
+    assert lazy.match('42').group(0) == '42'
+    assert isinstance(pickle.loads(pickle.dumps(lazy)), re.Pattern)
+
+def test_units_table():
+    from engfmt import units_table
+    quantities = [
+        Quantity('{}.5 {}'.format(i, units))
+        for units in ['kOhms', 'mV'] for i in range(10)
+    ]
+    assert len(set(id(q.units) for q in quantities)) == 2
+    assert len(set(id(q._scale_factor) for q in quantities)) == 2
+    table = units_table()
+    assert table['Ohms'].units is quantities[0].units
+    assert table['Ohms'].currency is False
+    assert Quantity('$10').units is units_table()['$'].units
+    assert units_table()['$'].currency is True
+
+    # formatting does not add to the table
+    size = len(units_table())
+    with preferences(spacer=''):
+        assert Quantity(1e-3, 'adhocA').to_eng() == '1madhocA'
+        assert Formatter().eng(2e3, 'adhocB') == '2kadhocB'
+        assert format_many([1, 2], 'adhocC').tolist() == ['1adhocC', '2adhocC']
+        assert Formatter().eng(-2e3, '$') == '-$2k'
+    assert len(units_table()) == size
@@ -1,4 +1,6 @@
-from engfmt import add_to_namespace, set_preferences
+from engfmt import add_to_namespace, load_quantities, preferences, set_preferences
+from io import StringIO
+import pytest
 set_preferences(spacer=' ')
 
 def test_namespace():
@@ -84,3 +86,108 @@ def test_namespace():
     assert str(epsilon0) == '8.8542 pF/m'
     assert str(mu0) == '1.2566 uH/m'
     assert str(Z0) == '376.73 Ohms'
+
+def test_load_quantities(tmp_path):
+    deck = """
+        -- Loop filter
+        Cs = 1.41pF  -- Shunt capacitance
+        Rz = 2.24KOhms
+        Fref = 156MHz  -- Reference frequency
+    """
+    quantities = load_quantities(deck)
+    assert list(quantities) == ['Cs', 'Rz', 'Fref']
+    assert str(quantities['Cs']) == '1.41 pF'
+    assert quantities['Cs'].name == 'Cs'
+    assert quantities['Cs'].desc == 'Shunt capacitance'
+    assert quantities['Rz'].desc is None
+    assert '{:Q}'.format(quantities['Fref']) == 'Fref = 156 MHz'
+
+    path = tmp_path / 'deck'
+    path.write_text(deck)
+    for source in [StringIO(deck), path]:
+        loaded = load_quantities(source)
+        assert [(q.name, str(q), q.desc) for q in loaded.values()] == [
+            (q.name, str(q), q.desc) for q in quantities.values()
+        ]
+
+    with preferences(assign_rec=r'\A\s*(?:(\w+)\s*:\s*)?(.*?)(?:\s*#\s*(.*?)\s*)?\Z'):
+        quantities = load_quantities('Vdd: 2.5V  # supply voltage')
+    assert quantities['Vdd'].desc == 'supply voltage'
+    assert str(quantities['Vdd']) == '2.5 V'
+
+    with pytest.raises(ValueError):
+        load_quantities('2.5V -- no name')
+
+def test_deck_cache(tmp_path):
+    import os
+    import struct
+    deck = tmp_path / 'deck'
+    deck.write_text(
+        'Cs = 1.41pF  -- Shunt capacitance\n'
+        'Rz = 2.24KOhms\n'
+        'light = c  -- Speed of light\n'
+        'Lvco = -125.00 dBc/Hz -- Phase noise (±1dB)\n'
+    )
+    cache = tmp_path / 'cache'
+
+    def load():
+        return [
+            (q.name, q.to_eng(), q.strip(), q.desc)
+            for q in load_quantities(deck, cache_dir=cache).values()
+        ]
+
+    expected = [
+        (q.name, q.to_eng(), q.strip(), q.desc)
+        for q in load_quantities(deck).values()
+    ]
+    assert load() == expected
+    cache_files = list(cache.iterdir())
+    assert len(cache_files) == 1
+    written = cache_files[0].stat().st_mtime_ns
+    assert load() == expected
+    assert cache_files[0].stat().st_mtime_ns == written
+
+    # touching the deck without changing it does not invalidate the cache, and
+    # the cache is updated with the new time so the digest is not checked again
+    os.utime(deck, ns=(written + 10**9, written + 10**9))
+    assert load() == expected
+    header = cache_files[0].read_bytes()[8:24]
+    assert header == struct.pack('=qQ', written + 10**9, deck.stat().st_size)
+    assert load() == expected
+
+    # changing the deck does
+    deck.write_text('Cs = 1.42pF  -- Shunt capacitance\n')
+    assert load() == [('Cs', '1.42 pF', '1.42p', 'Shunt capacitance')]
+
+    # as does changing how it is parsed
+    with preferences(ignore_sf=True):
+        assert load() == [('Cs', '1.42 pF', '1.42', 'Shunt capacitance')]
+
+    # a corrupt cache is ignored and replaced
+    expected = [('Cs', '1.42 pF', '1.42p', 'Shunt capacitance')]
+    cache_files[0].write_bytes(b'junk')
+    assert load() == expected
+    good = cache_files[0].read_bytes()
+    damaged = [good[:-3], good[:100]]
+    for i in range(len(good)):
+        if 8 <= i < 56:
+            # the deck time, size and digest; the digest is only checked if
+            # the time or size differ, and it still matches the deck, so the
+            # cache is still used
+            continue
+        corrupt = bytearray(good)
+        corrupt[i] ^= 0x5a
+        damaged.append(bytes(corrupt))
+    for contents in damaged:
+        cache_files[0].write_bytes(contents)
+        assert load() == expected
+        assert cache_files[0].read_bytes() == good
+
+def test_unpack_quantities():
+    from engfmt import _pack_quantities, _unpack_quantities
+    quantities = load_quantities('Cs = 1.41pF -- Shunt\nRz = 2.24KOhms')
+    packed = _pack_quantities(quantities.values())
+    assert [q.name for q in _unpack_quantities(packed)] == ['Cs', 'Rz']
+    for damaged in [packed[:-3], packed[:40], packed[:2], packed + b'x']:
+        with pytest.raises(ValueError):
+            _unpack_quantities(damaged)
@@ -0,0 +1,73 @@
+# encoding: utf8
+
+import asyncio
+import threading
+from engfmt import (
+    Quantity, preferences, set_preferences, quant_to_eng, quant_to_str
+)
+
+def test_scoped():
+    q = Quantity('1.4204GHz')
+    outside = q.to_eng()
+    with preferences(hprec=2, spacer=' '):
+        assert q.to_eng() == '1.42 GHz'
+        assert q.to_unitless_eng() == '1.42G'
+        assert q.to_eng(4) == '1.4204 GHz'
+        with preferences(hprec=None):
+            assert q.to_eng() == '1.4204 GHz'
+        set_preferences(spacer='')
+        assert q.to_eng() == '1.42GHz'
+    assert q.to_eng() == outside
+    with preferences(ignore_sf=True, spacer=''):
+        assert quant_to_str('1m') == '1m'
+        with preferences(ignore_sf=None):
+            assert quant_to_str('1m') == '1e-3'
+
+def test_unitless_eng_does_not_mutate():
+    q = Quantity('1.4204GHz')
+    seen = set()
+    def format_repeatedly():
+        for i in range(2000):
+            seen.add(q.units)
+            q.to_unitless_eng()
+    threads = [threading.Thread(target=format_repeatedly) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {'Hz'}
+    assert q.units == 'Hz'
+
+def test_threads():
+    results = {}
+    def format_with(name, **kwargs):
+        with preferences(**kwargs):
+            results[name] = [quant_to_eng('1.4204GHz') for i in range(500)]
+    threads = [
+        threading.Thread(target=format_with, args=('a',), kwargs=dict(
+            hprec=1, spacer=''
+        )),
+        threading.Thread(target=format_with, args=('b',), kwargs=dict(
+            hprec=3, spacer=' '
+        )),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(results['a']) == {'1.4GHz'}
+    assert set(results['b']) == {'1.42 GHz'}
+
+def test_asyncio_tasks():
+    async def format_with(prec):
+        with preferences(hprec=prec, spacer=''):
+            values = []
+            for i in range(10):
+                await asyncio.sleep(0)
+                values.append(quant_to_eng('1.4204GHz'))
+            return set(values)
+
+    async def run():
+        return await asyncio.gather(format_with(0), format_with(2))
+
+    assert asyncio.run(run()) == [{'1GHz'}, {'1.42GHz'}]
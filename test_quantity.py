@@ -247,3 +247,63 @@ def test_number_recognition():
         hprec=None, mprec=None, spacer=None, unity=None, output=None,
         ignore_sf=None, assign_fmt=None, assign_rec=None
     )
+
+# strings that exercise the corners of the number converters
+unusual_numbers = [
+    '', ' ', '1', ' 1 ', '1.', '.1', '1.5.3', '1e', '1E', '1e3k', '1Ex', '1E5',
+    '1 m s', '1 meter', '1m_A', '1_', '1__', '1_A', '1e-9 _s', '1 H/(m-s)',
+    '$', '$1 ', '$1 k', '$1E', '$1e', '$-1', '-$1e-3', '$nan', '+$INF', '$1V',
+    'nan ', 'nan  Hz', 'Inf', 'nanHz', '-nan m/s', 'infinity', 'inf inf',
+    'eps0', 'h', 'xxx', '1 2', '--1', '+-1', '1e+3', '1e+3 J-s',
+]
+
+def test_single_pass_recognizer():
+    from engfmt import (
+        _scan, all_number_recognizer, sf_free_number_recognizer,
+        all_number_converters, sf_free_number_converters,
+    )
+    cases = [case.text for case in test_cases] + unusual_numbers
+    for recognizer, converters in [
+        (all_number_recognizer, all_number_converters),
+        (sf_free_number_recognizer, sf_free_number_converters),
+    ]:
+        for text in cases:
+            for pattern, get_mant, get_sf, get_units in converters:
+                match = pattern.match(text)
+                if match:
+                    expected = get_mant(match), get_sf(match), get_units(match)
+                    break
+            else:
+                expected = None
+            components = _scan(text, recognizer)
+            assert (components and components[1:]) == expected, text
+
+def test_eng_rounding():
+    # the mantissa is rendered by shifting digits, up to a precision of 14,
+    # and by scaling the value beyond that; both must round as the value did
+    from engfmt import preferences
+    cases = [
+        (999.95, 3, '1kV'),
+        (999.95, 2, '1kV'),
+        (999.94, 3, '999.9V'),
+        (-999.95, 3, '-1kV'),
+        (99.995, 3, '100V'),
+        (9.9995, 3, '9.999V'),  # 9.9995 is slightly less in binary
+        (0.00099995, 3, '1mV'),
+        (999999.5, 5, '1MV'),
+        (999.5, 0, '1kV'),
+        (0, 15, '0V'),
+        (1/3*1e4, 14, '3.33333333333333kV'),
+        (1/3*1e4, 15, '3.333333333333333kV'),
+        (1/3*1e4, 16, '3.333333333333333kV'),
+        (123456.789012345678, 14, '123.456789012346kV'),
+        (123456.789012345678, 15, '123.4567890123457kV'),
+        (-2/3*1e-5, 14, '-6.66666666666667uV'),
+        (-2/3*1e-5, 15, '-6.666666666666667uV'),
+        (999.99999999999, 14, '999.99999999999V'),
+        (999.99999999999, 15, '999.99999999999V'),
+        (999.999999999999999, 14, '1kV'),
+    ]
+    with preferences(spacer=''):
+        for value, prec, expected in cases:
+            assert Quantity(value, 'V').to_eng(prec) == expected, (value, prec)
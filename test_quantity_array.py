@@ -0,0 +1,48 @@
+from array import array
+import pytest
+from engfmt import Quantity, QuantityArray
+
+def test_quantity_array():
+    qa = QuantityArray.from_strings(['1.5 MHz', '3MHz', '1e3 Hz'])
+    assert len(qa) == 3
+    assert qa.units == 'Hz'
+    assert qa.tolist() == [1.5e6, 3e6, 1e3]
+    assert isinstance(qa[0], Quantity)
+    assert qa[0].to_tuple() == (1.5e6, 'Hz')
+    assert qa[-1].to_tuple() == (1e3, 'Hz')
+    assert [q.to_float() for q in qa] == [1.5e6, 3e6, 1e3]
+    assert qa.to_eng() == [Quantity(v, 'Hz').to_eng() for v in qa.tolist()]
+    assert qa.to_eng(1) == [Quantity(v, 'Hz').to_eng(1) for v in qa.tolist()]
+    assert qa.to_str() == [Quantity(v, 'Hz').to_str() for v in qa.tolist()]
+    assert repr(qa) == "QuantityArray([1500000.0, 3000000.0, 1000.0], 'Hz')"
+
+    # slices share the underlying storage
+    values = array('d', [1, 2, 3, 4])
+    qa = QuantityArray(values, 'V')
+    tail = qa[1::2]
+    assert tail.tolist() == [2, 4]
+    values[3] = 8
+    assert tail.tolist() == [2, 8]
+    assert tail.units == 'V'
+
+    # other iterables are copied into an array
+    assert QuantityArray([1, 2.5], 's').tolist() == [1, 2.5]
+    assert QuantityArray(range(3)).tolist() == [0, 1, 2]
+
+    # the units must agree, whatever the order
+    for values in [['1V', '2A'], ['1V', '2'], ['1', '2V']]:
+        with pytest.raises(ValueError):
+            QuantityArray.from_strings(values)
+    with pytest.raises(ValueError):
+        QuantityArray.from_strings(['1V', '2V'], 'A')
+    assert QuantityArray.from_strings(['1V', '2V'], 'V').units == 'V'
+    assert QuantityArray.from_strings([]).units == ''
+
+def test_quantity_array_numpy():
+    np = pytest.importorskip('numpy')
+    values = np.linspace(0, 1e-6, 5)
+    qa = QuantityArray(values, 's')
+    head = qa[:2]
+    values[1] = 42
+    assert head.tolist() == [0, 42]
+    assert np.asarray(qa.values).tolist() == values.tolist()
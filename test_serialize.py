@@ -0,0 +1,108 @@
+# encoding: utf8
+
+from engfmt import (
+    Quantity, QuantityArray, dumps, loads, dumps_many, loads_many, preferences
+)
+import math
+import pytest
+
+def test_round_trip():
+    quantities = [
+        Quantity('1.4204GHz'),
+        Quantity('1420.405751786 MHz'),
+        Quantity('-2.5e-9 s'),
+        Quantity('0.000000000000000000012345678901234567890 F'),
+        Quantity('$10.50'),
+        Quantity('-inf Hz'),
+        Quantity('nan'),
+        Quantity('47_Ohms'),
+        Quantity(47, 'Ω'),
+        Quantity('c'),
+        Quantity(1/3, 'V'),
+        Quantity(2.5),
+        Quantity(2.5, None),
+    ]
+    loaded = loads_many(dumps_many(quantities))
+    assert len(loaded) == len(quantities)
+    with preferences(spacer=' '):
+        for original, copy in zip(quantities, loaded):
+            assert copy.to_str() == original.to_str()
+            assert copy.strip() == original.strip()
+            assert copy.to_eng() == original.to_eng()
+            assert copy.units == original.units
+            if math.isnan(original):
+                assert math.isnan(copy)
+            else:
+                assert float(copy) == float(original)
+
+    q = loads(dumps(Quantity('1.4204GHz')))
+    assert (q.strip(), q.units) == ('1.4204G', 'Hz')
+    assert loads_many(dumps_many([])) == []
+
+def test_quantity_array():
+    values = QuantityArray([1e-9, 2.5e-9, float('inf')], 's')
+    data = dumps_many(values)
+    loaded = loads_many(data)
+    assert isinstance(loaded, QuantityArray)
+    assert loaded.units == 's'
+    assert loaded.tolist() == values.tolist()
+    assert len(data) < len(dumps_many(list(values)))
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        loads_many(b'not quantities')
+    with pytest.raises(ValueError):
+        loads_many(dumps_many([Quantity('1ns')])[:20])
+
+    # header (16 bytes), names 's\0n', values (2 doubles), unit ids (2 uint16),
+    # scale factor ids (2 uint16), mantissas length (uint32), mantissas '1'
+    data = dumps_many([Quantity('1ns'), Quantity(2, 's')])
+    assert [q.to_tuple() for q in loads_many(data)] == [(1e-9, 's'), (2, 's')]
+    def replace(offset, piece):
+        return data[:offset] + piece + data[offset + len(piece):]
+    for damaged in [
+        replace(35, b'\x05\x00'),  # unit id beyond the names
+        replace(41, b'\x02\x00'),  # more scale factors than mantissas
+        replace(39, b'\x00\x00'),  # more mantissas than scale factors
+        replace(43, b'\x02'),       # mantissas length beyond the data
+        data[:37],                  # truncated unit ids
+        data[:-1],                  # truncated mantissas
+        data + b'x',                # trailing data
+        replace(8, b'\x01'),        # fewer names than given
+    ]:
+        with pytest.raises(ValueError):
+            loads_many(damaged)
+    with pytest.raises(ValueError):
+        loads(dumps_many([]))
+
+def test_pickle():
+    import pickle
+    from engfmt import QuantityList, load_quantities
+    q = Quantity('1.4204GHz')
+    copy = pickle.loads(pickle.dumps(q))
+    assert type(copy) is Quantity
+    assert (copy.strip(), copy.units, float(copy)) == ('1.4204G', 'Hz', 1.4204e9)
+    assert copy.__dict__ == q.__dict__
+
+    deck = load_quantities('f = 1.4204GHz -- hydrogen line\nT = 300_K')
+    for q in deck.values():
+        copy = pickle.loads(pickle.dumps(q))
+        assert copy.__dict__ == q.__dict__
+
+    quantities = QuantityList(
+        [Quantity('1ns'), Quantity(2.5e-9, 's'), Quantity('$10'), Quantity(3)]
+    )
+    data = pickle.dumps(quantities)
+    copy = pickle.loads(data)
+    assert type(copy) is QuantityList
+    assert [q.__dict__ for q in copy] == [q.__dict__ for q in quantities]
+    assert len(data) < len(pickle.dumps(list(quantities)))
+
+    # members with names are pickled individually
+    quantities = QuantityList(deck.values())
+    copy = pickle.loads(pickle.dumps(quantities))
+    assert [q.__dict__ for q in copy] == [q.__dict__ for q in quantities]
+
+    array = QuantityArray([1e-9, 2.5e-9], 's')
+    copy = pickle.loads(pickle.dumps(array))
+    assert (copy.tolist(), copy.units) == ([1e-9, 2.5e-9], 's')
@@ -0,0 +1,54 @@
+from engfmt import (
+    Quantity, all_to_eng_fmt, set_stats, stats, reset_stats, set_parse_cache,
+)
+import pytest
+
+def test_stats():
+    assert stats() is None
+    events = []
+    set_stats(True, hook=lambda kind, name, elapsed: events.append((kind, name)))
+    try:
+        Quantity('1.5ns')
+        Quantity('2e-9 s')
+        Quantity('$10')
+        Quantity('c')
+        with pytest.raises(ValueError):
+            Quantity('xyzzy')
+        s = stats()
+        assert s['parse']['counts'] == {
+            'number_with_scale_factor': 1,
+            'number_with_exponent': 1,
+            'simple_currency': 1,
+            'constant': 1,
+            'invalid': 1,
+        }
+        assert s['parse']['calls'] == 5
+        assert s['parse']['time'] > 0
+
+        q = Quantity(1e-9, 's')
+        q.to_eng()
+        q.to_sci()
+        q.to_str()
+        format(q, 'r')
+        assert stats()['format']['counts'] == {
+            'to_eng': 1, 'to_sci': 1, 'to_str': 1, 'to_unitless_eng': 1
+        }
+
+        all_to_eng_fmt('a 1e-9s b 2e3V c')
+        text = stats()['text']
+        assert (text['calls'], text['matches']) == (1, 2)
+        assert text['counts'] == {'quant_to_eng': 1}
+        assert events[-1][0] == 'text'
+        assert events[0] == ('parse', 'number_with_scale_factor')
+
+        set_parse_cache(10)
+        reset_stats()
+        Quantity('1.5ns')
+        Quantity('1.5ns')
+        assert stats()['parse']['counts'] == {
+            'number_with_scale_factor': 1, 'cached': 1
+        }
+    finally:
+        set_parse_cache(None)
+        set_stats(False)
+    assert stats() is None
@@ -26,3 +26,164 @@ def test_text_processing():
         names.add(case.name)
         assert case.eng == all_to_eng_fmt(case.flt), case.name
         assert all_from_eng_fmt(case.eng) == case.flt, case.name
+
+def test_replacement():
+    # numbers are converted without creating quantities, the results must
+    # match those of the quantities, including the tokens that need them
+    from engfmt import (
+        quant_to_eng, quant_to_str, preferences,
+        embedded_floating_point_notation, embedded_engineering_notation,
+    )
+    flt = '1e3V 5mV 5m 2E-5 7k_V 3_V 1eV 2mu 4Ez 0 .5kOhms'
+    eng = '5mV 5m 7k_V 3_V 1_ 2.5kOhms 4Ez 6u 8M'
+    def reference(text, pattern, convert):
+        out = []
+        start = 0
+        for match in pattern.finditer(text):
+            token = match.group(0)
+            try:
+                token = convert(token)
+            except ValueError:
+                pass
+            out.append(text[start:match.start(0)] + token)
+            start = match.end(0)
+        return ''.join(out) + text[start:]
+    for prefs in [
+        dict(spacer=''), dict(spacer=' '), dict(ignore_sf=True),
+        dict(spacer=' ', unity='_', output='km', hprec=2),
+    ]:
+        with preferences(**prefs):
+            assert all_to_eng_fmt(flt) == reference(
+                flt, embedded_floating_point_notation, quant_to_eng
+            ), prefs
+            assert all_from_eng_fmt(eng) == reference(
+                eng, embedded_engineering_notation, quant_to_str
+            ), prefs
+    with preferences(spacer=' '):
+        assert all_to_eng_fmt('1e3V 5m 3_V') == '1 kV 5m 3 V'
+        assert all_from_eng_fmt('5mV 3_V') == '5e-3 V 3 V'
+    with preferences(spacer=' ', ignore_sf=True):
+        assert all_to_eng_fmt('5mV') == '5 mV'
+        assert all_from_eng_fmt('5mV 3_V') == '5 mV 3_V'
+
+def test_overflow(tmp_path):
+    # numbers too large to represent are left unchanged
+    from engfmt import file_to_eng_fmt, preferences
+    text = 'a 91E495hfa b 1e999V c 1e999V_x d 2e3V\n'
+    expected = 'a 91E495hfa b 1e999V c 1e999V_x d 2 kV\n'
+    with preferences(spacer=' '):
+        assert all_to_eng_fmt(text) == expected
+        src = tmp_path / 'src'
+        dest = tmp_path / 'dest'
+        src.write_text(text)
+        file_to_eng_fmt(str(src), str(dest))
+        assert dest.read_text() == expected
+
+def test_streaming():
+    from io import StringIO
+    from engfmt import stream_to_eng_fmt, stream_from_eng_fmt
+    set_preferences(spacer='', output=None)
+    flt = ' '.join(case.flt for case in test_cases) + ' x 1.5e-9s\n'
+    eng = all_to_eng_fmt(flt)
+    # split the text at every possible place
+    for i in range(len(flt)):
+        assert ''.join(stream_to_eng_fmt([flt[:i], flt[i:]])) == eng, i
+    for i in range(len(eng)):
+        assert ''.join(stream_from_eng_fmt([eng[:i], eng[i:]])) == flt, i
+    for size in [1, 2, 3, 7, 1000]:
+        assert ''.join(stream_to_eng_fmt(StringIO(flt), size)) == eng, size
+        assert ''.join(stream_from_eng_fmt(StringIO(eng), size)) == flt, size
+    assert list(stream_to_eng_fmt([])) == []
+
+def test_async_streaming():
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from engfmt import (
+        astream_to_eng_fmt, astream_from_eng_fmt, preferences
+    )
+    set_preferences(spacer='', output=None)
+    flt = ' '.join(case.flt for case in test_cases) + ' x 1.5e-9s µ\n'
+    eng = all_to_eng_fmt(flt)
+
+    async def pieces(*pieces):
+        for piece in pieces:
+            yield piece
+
+    async def collect(generator):
+        return ''.join([text async for text in generator])
+
+    async def run():
+        # split the text at every possible place, as strings and as bytes
+        for i in range(len(flt)):
+            result = await collect(astream_to_eng_fmt(pieces(flt[:i], flt[i:])))
+            assert result == eng, i
+        data = eng.encode('utf8')
+        for i in range(len(data)):
+            result = await collect(
+                astream_from_eng_fmt(pieces(data[:i], data[i:]))
+            )
+            assert result == flt, i
+
+        # read from a stream reader
+        reader = asyncio.StreamReader()
+        reader.feed_data(flt.encode('utf8'))
+        reader.feed_eof()
+        assert await collect(astream_to_eng_fmt(reader, 5)) == eng
+
+        # offload to an executor, the preferences of the caller are used
+        with ThreadPoolExecutor(1) as executor, preferences(spacer=' '):
+            result = await collect(astream_to_eng_fmt(
+                pieces(flt, flt), executor=executor, offload_size=10
+            ))
+            assert result == 2*all_to_eng_fmt(flt)
+            assert ' 1.5 ns ' in result
+        assert await collect(astream_to_eng_fmt(pieces())) == ''
+    asyncio.run(run())
+
+def test_files(tmp_path):
+    from engfmt import file_to_eng_fmt, file_from_eng_fmt
+    set_preferences(spacer='', output=None)
+    flt = '\n'.join(
+        '{} µ {} é'.format(case.flt, case.name) for case in test_cases
+    ) * 3
+    src = tmp_path / 'flt.txt'
+    src.write_text(flt, encoding='utf8')
+    eng = tmp_path / 'eng.txt'
+    file_to_eng_fmt(str(src), str(eng))
+    assert eng.read_text(encoding='utf8') == all_to_eng_fmt(flt)
+    with open(str(eng), 'rb') as f, open(str(src), 'wb') as g:
+        file_from_eng_fmt(f, g)
+        assert not f.closed and not g.closed
+    assert src.read_text(encoding='utf8') == flt
+
+    empty = tmp_path / 'empty.txt'
+    empty.write_text('')
+    file_to_eng_fmt(str(empty), str(eng))
+    assert eng.read_text() == ''
+
+def test_parallel_files(tmp_path):
+    from engfmt import file_to_eng_fmt, file_from_eng_fmt
+    flt = '\n'.join(
+        '{} {} 1.5e-9s'.format(case.flt, case.name) for case in test_cases
+    ) * 50
+    src = tmp_path / 'flt.txt'
+    src.write_text(flt)
+    eng = tmp_path / 'eng.txt'
+    back = tmp_path / 'back.txt'
+    try:
+        set_preferences(spacer=' ', output=None)
+        file_to_eng_fmt(str(src), str(eng), workers=3, chunk_size=100)
+        assert eng.read_text() == all_to_eng_fmt(flt)
+        file_from_eng_fmt(str(eng), str(back), workers=2, chunk_size=1)
+        assert back.read_text() == all_from_eng_fmt(all_to_eng_fmt(flt))
+
+        # a file without a path the workers could open is converted here
+        import tempfile
+        with tempfile.TemporaryFile() as f, tempfile.TemporaryFile() as out:
+            f.write(flt.encode('utf8'))
+            f.flush()
+            file_to_eng_fmt(f, out, workers=2, chunk_size=100)
+            out.seek(0)
+            assert out.read().decode('utf8') == all_to_eng_fmt(flt)
+    finally:
+        set_preferences(spacer='')